@@ -6,13 +6,73 @@ Creates MP4 videos from animation frames using ffmpeg
 
 import os
 import sys
+import shutil
 import subprocess
+import tempfile
 import argparse
+from functools import lru_cache
 from pathlib import Path
 
-def create_video_from_frames(frames_dir, output_path, fps=2, quality='medium'):
+@lru_cache(maxsize=None)
+def _available_encoders():
+    """
+    Return the ffmpeg encoder listing (cached, ffmpeg is only probed once)
+    """
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                capture_output=True, text=True, check=True)
+        return result.stdout
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return ''
+
+def _detect_hw_encoder():
+    """
+    Return the first hardware H.264 encoder ffmpeg supports, or None
+    """
+    encoders = _available_encoders()
+    for name, key in (('h264_nvenc', 'nvenc'), ('h264_vaapi', 'vaapi')):
+        if name in encoders:
+            return key
+    return None
+
+def _encoder_args(encoder, crf, preset):
+    """
+    Build the ffmpeg codec arguments for the selected encoder
+    """
+    if encoder == 'nvenc':
+        if crf == '0':
+            # -cq 0 means "no quality target" to NVENC, lossless needs its own tuning
+            return ['-c:v', 'h264_nvenc', '-preset', 'p7', '-tune', 'lossless', '-pix_fmt', 'yuv420p']
+        # NVENC constant-quality VBR; -cq uses the same scale as libx264 -crf
+        return ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-cq', crf,
+                '-pix_fmt', 'yuv420p']
+    if encoder == 'vaapi':
+        return ['-vaapi_device', '/dev/dri/renderD128',
+                '-vf', 'format=nv12,hwupload', '-c:v', 'h264_vaapi', '-qp', crf]
+    return ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-preset', preset, '-crf', crf]
+
+def _link_numbered_frames(frames_dir, frame_files, link_dir):
+    """
+    Expose the sorted frames as link_dir/frame_000000.jpg, ... and return the
+    numeric pattern, so ffmpeg's image2 demuxer opens frames by index
+    instead of expanding and sorting a glob
+    """
+    for i, frame_file in enumerate(frame_files):
+        source = os.path.abspath(os.path.join(frames_dir, frame_file))
+        link = os.path.join(link_dir, f'frame_{i:06d}.jpg')
+        try:
+            os.symlink(source, link)
+        except OSError:  # e.g. Windows without symlink privilege
+            shutil.copyfile(source, link)
+    return os.path.join(link_dir, 'frame_%06d.jpg')
+
+def create_video_from_frames(frames_dir, output_path, fps=2, quality='medium', encoder='auto', preset=None):
     """
     Create MP4 video from animation frames using ffmpeg
+
+    encoder: 'auto' picks a hardware encoder when ffmpeg exposes one,
+    'cpu' forces libx264, 'nvenc'/'vaapi' force the given hardware path.
+    preset overrides the libx264 preset implied by the quality tier.
     """
     if not os.path.exists(frames_dir):
         print(f"Error: Frames directory does not exist: {frames_dir}")
@@ -39,41 +99,55 @@ def create_video_from_frames(frames_dir, output_path, fps=2, quality='medium'):
     print(f"FPS: {fps}")
     print(f"Quality: {quality}")
     
-    # Quality settings
+    # Quality settings: (libx264 preset, CRF); the CRF is reused as NVENC -cq / VAAPI -qp,
+    # except that lossless maps to NVENC's lossless tuning
     quality_settings = {
-        'low': ['-crf', '28'],
-        'medium': ['-crf', '23'],
-        'high': ['-crf', '18'],
-        'lossless': ['-crf', '0']
+        'low': ('veryfast', '28'),
+        'medium': ('faster', '23'),
+        'high': ('slow', '18'),
+        'lossless': ('veryslow', '0')
     }
+    default_preset, crf = quality_settings.get(quality, quality_settings['medium'])
+    preset = preset or default_preset
     
-    # Build ffmpeg command
-    input_pattern = os.path.join(frames_dir, 'frame_%03d_*.jpg')
-    
-    cmd = [
-        'ffmpeg',
-        '-y',  # Overwrite output file
-        '-framerate', str(fps),
-        '-pattern_type', 'glob',
-        '-i', input_pattern,
-        '-c:v', 'libx264',
-        '-pix_fmt', 'yuv420p',
-        *quality_settings.get(quality, quality_settings['medium']),
-        '-movflags', '+faststart',  # Enable fast start for web streaming
-        output_path
-    ]
+    if encoder == 'auto':
+        # The encoder can be compiled into ffmpeg without a usable GPU behind it
+        encoders = [_detect_hw_encoder() or 'cpu']
+        if encoders[0] != 'cpu':
+            encoders.append('cpu')
+    else:
+        encoders = [encoder]
     
-    try:
-        print("Running ffmpeg...")
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        print("Video created successfully!")
-        return True
+    with tempfile.TemporaryDirectory() as link_dir:
+        input_pattern = _link_numbered_frames(frames_dir, frame_files, link_dir)
         
-    except subprocess.CalledProcessError as e:
-        print(f"ffmpeg error: {e}")
-        print(f"stdout: {e.stdout}")
-        print(f"stderr: {e.stderr}")
-        return False
+        for encoder in encoders:
+            # Build ffmpeg command
+            cmd = [
+                'ffmpeg',
+                '-y',  # Overwrite output file
+                '-framerate', str(fps),
+                '-start_number', '0',
+                '-i', input_pattern,
+                *_encoder_args(encoder, crf, preset),
+                '-movflags', '+faststart',  # Enable fast start for web streaming
+                output_path
+            ]
+            
+            try:
+                print(f"Running ffmpeg ({encoder})...")
+                result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+                print("Video created successfully!")
+                return True
+                
+            except subprocess.CalledProcessError as e:
+                if encoder != encoders[-1]:
+                    print(f"{encoder} encoding failed, falling back to libx264")
+                    continue
+                print(f"ffmpeg error: {e}")
+                print(f"stdout: {e.stdout}")
+                print(f"stderr: {e.stderr}")
+                return False
 
 def create_gif_from_frames(frames_dir, output_path, fps=2, width=800):
     """
@@ -91,20 +165,22 @@ def create_gif_from_frames(frames_dir, output_path, fps=2, width=800):
     
     print(f"Creating animated GIF from {len(frame_files)} frames...")
     
-    # Build ffmpeg command for GIF
-    input_pattern = os.path.join(frames_dir, 'frame_%03d_*.jpg')
-    
-    cmd = [
-        'ffmpeg',
-        '-y',
-        '-framerate', str(fps),
-        '-pattern_type', 'glob',
-        '-i', input_pattern,
-        '-vf', f'scale={width}:-1:flags=lanczos,palettegen=reserve_transparent=0',
-        '-y', 'palette.png'
-    ]
+    link_dir = tempfile.mkdtemp()
     
     try:
+        input_pattern = _link_numbered_frames(frames_dir, frame_files, link_dir)
+        
+        # Build ffmpeg command for GIF
+        cmd = [
+            'ffmpeg',
+            '-y',
+            '-framerate', str(fps),
+            '-start_number', '0',
+            '-i', input_pattern,
+            '-vf', f'scale={width}:-1:flags=lanczos,palettegen=reserve_transparent=0',
+            '-y', 'palette.png'
+        ]
+        
         # Generate palette
         subprocess.run(cmd, capture_output=True, check=True)
         
@@ -113,7 +189,7 @@ def create_gif_from_frames(frames_dir, output_path, fps=2, width=800):
             'ffmpeg',
             '-y',
             '-framerate', str(fps),
-            '-pattern_type', 'glob',
+            '-start_number', '0',
             '-i', input_pattern,
             '-i', 'palette.png',
             '-filter_complex', f'scale={width}:-1:flags=lanczos[x];[x][1:v]paletteuse',
@@ -132,6 +208,9 @@ def create_gif_from_frames(frames_dir, output_path, fps=2, width=800):
     except subprocess.CalledProcessError as e:
         print(f"ffmpeg error: {e}")
         return False
+    
+    finally:
+        shutil.rmtree(link_dir, ignore_errors=True)
 
 def main():
     parser = argparse.ArgumentParser(description="Create videos from animation frames")
@@ -141,6 +220,8 @@ def main():
     parser.add_argument("--format", choices=['mp4', 'gif'], default='mp4', help="Output format")
     parser.add_argument("--quality", choices=['low', 'medium', 'high', 'lossless'], default='medium', help="Video quality")
     parser.add_argument("--width", type=int, default=800, help="Width for GIF output")
+    parser.add_argument("--preset", choices=['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow'], help="Override the libx264 preset for the chosen quality")
+    parser.add_argument("--encoder", choices=['auto', 'cpu', 'nvenc', 'vaapi'], default='auto', help="MP4 encoder (auto uses a hardware encoder when available)")
     
     args = parser.parse_args()
     
@@ -152,7 +233,9 @@ def main():
             args.frames_dir, 
             args.output, 
             args.fps, 
-            args.quality
+            args.quality,
+            args.encoder,
+            args.preset
         )
     elif args.format == 'gif':
         success = create_gif_from_frames(
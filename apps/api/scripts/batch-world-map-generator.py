@@ -5,10 +5,36 @@ Generates complete world maps from downloaded Terra satellite data
 """
 
 import os
+import re
 import sys
 import subprocess
 from datetime import datetime, timedelta
 import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+# Date part of a Terra image filename, e.g. ..._TrueColor_2023-01-01.jpg or ..._2023-01-01_3_4_2.jpg
+DATE_RE = re.compile(r'(?:^|_)(\d{4}-\d{2}-\d{2})(?=[_.])')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg')
+
+# Per-worker generator instance for --mode stitch-then-encode
+_world_map_generator = None
+
+def _scan_files(directory):
+    """Recursively yield file entries below directory"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
+def _is_valid_date(date):
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+        return True
+    except ValueError:
+        return False
 
 def find_downloaded_dates(terra_downloads_dir):
     """Find all dates with downloaded Terra data"""
@@ -19,23 +45,16 @@ def find_downloaded_dates(terra_downloads_dir):
         return []
     
     # Scan through all subdirectories for image files
-    for root, dirs, files in os.walk(terra_downloads_dir):
-        for file in files:
-            if file.endswith('.jpg') or file.endswith('.jpeg'):
-                # Extract date from filename like: MODIS_Terra_CorrectedReflectance_TrueColor_2023-01-01.jpg
-                parts = file.split('_')
-                for part in parts:
-                    if len(part) == 10 and part.count('-') == 2:
-                        try:
-                            datetime.strptime(part, '%Y-%m-%d')
-                            dates.add(part)
-                        except ValueError:
-                            continue
-    
-    return sorted(list(dates))
+    for entry in _scan_files(terra_downloads_dir):
+        if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            # Extract date from filename like: MODIS_Terra_CorrectedReflectance_TrueColor_2023-01-01.jpg
+            dates.update(DATE_RE.findall(entry.name))
+    
+    # Validate each distinct date once rather than once per file
+    return sorted(date for date in dates if _is_valid_date(date))
 
 def generate_world_map_for_date(date, output_dir, zoom_level=2):
-    """Generate a world map for a specific date"""
+    """Generate a world map for a specific date, returns (date, success)"""
     script_path = os.path.join(os.path.dirname(__file__), 'complete-world-map-generator.py')
     
     cmd = [
@@ -53,18 +72,90 @@ def generate_world_map_for_date(date, output_dir, zoom_level=2):
         
         if result.returncode == 0:
             print(f"✅ Successfully generated world map for {date}")
-            return True
+            return date, True
         else:
             print(f"❌ Failed to generate world map for {date}")
             print(f"Error: {result.stderr}")
-            return False
+            return date, False
             
     except subprocess.TimeoutExpired:
         print(f"⏰ Timeout generating world map for {date}")
-        return False
+        return date, False
+    except Exception as e:
+        print(f"❌ Error generating world map for {date}: {e}")
+        return date, False
+
+def _load_world_map_generator():
+    """Import complete-world-map-generator.py (hyphenated name, so not importable directly)"""
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'complete-world-map-generator.py')
+    spec = importlib.util.spec_from_file_location('complete_world_map_generator', script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.TerraWorldMapGenerator()
+
+def stitch_world_map_for_date(date, output_dir, zoom_level=2):
+    """Generate a world map inside the current worker process, returns (date, success)"""
+    global _world_map_generator
+    
+    print(f"🌍 Generating world map for {date}...")
+    
+    try:
+        if _world_map_generator is None:
+            _world_map_generator = _load_world_map_generator()
+        
+        success = _world_map_generator.generate_complete_world_map(date, output_dir, zoom_level)
+        return date, bool(success)
+        
     except Exception as e:
         print(f"❌ Error generating world map for {date}: {e}")
+        return date, False
+
+def encode_world_maps_video(map_paths, video_path, fps=2):
+    """Encode world maps into one MP4 with a single ffmpeg concat job"""
+    concat_path = os.path.splitext(video_path)[0] + '_concat.txt'
+    frame_duration = 1.0 / fps
+    
+    def concat_entry(path):
+        escaped = os.path.abspath(path).replace("'", "'\\''")
+        return f"file '{escaped}'\n"
+    
+    with open(concat_path, 'w') as f:
+        for path in map_paths:
+            f.write(concat_entry(path))
+            f.write(f"duration {frame_duration:.6f}\n")
+        # The concat demuxer drops the last duration unless the final file is repeated
+        f.write(concat_entry(map_paths[-1]))
+    
+    cmd = [
+        'ffmpeg',
+        '-y',
+        '-f', 'concat',
+        '-safe', '0',
+        '-i', concat_path,
+        '-vf', f'fps={fps},scale=trunc(iw/2)*2:trunc(ih/2)*2',
+        '-c:v', 'libx264',
+        '-preset', 'faster',
+        '-crf', '23',
+        '-pix_fmt', 'yuv420p',
+        '-movflags', '+faststart',
+        video_path
+    ]
+    
+    print(f"🎬 Encoding {len(map_paths)} world maps into {video_path}...")
+    
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        print(f"✅ Created video: {video_path}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"❌ ffmpeg failed: {e.stderr}")
+        return False
+    except FileNotFoundError:
+        print("❌ ffmpeg is not installed or not in PATH")
         return False
+    finally:
+        if os.path.exists(concat_path):
+            os.remove(concat_path)
 
 def main():
     parser = argparse.ArgumentParser(description="Batch generate Terra complete world maps")
@@ -74,6 +165,13 @@ def main():
     parser.add_argument("--limit", "-l", type=int, help="Limit number of maps to generate")
     parser.add_argument("--start-date", help="Start date (YYYY-MM-DD)")
     parser.add_argument("--end-date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("--jobs", "-j", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Number of world maps to generate in parallel")
+    parser.add_argument("--mode", choices=['per-date', 'stitch-then-encode'], default='per-date',
+                        help="per-date runs one generator process per map; stitch-then-encode "
+                             "stitches in a worker pool and encodes all maps into one MP4")
+    parser.add_argument("--fps", type=float, default=2, help="Video frame rate (stitch-then-encode)")
+    parser.add_argument("--video", help="Output MP4 path (stitch-then-encode, default: <output>/terra_world_maps_z<zoom>.mp4)")
     
     args = parser.parse_args()
     
@@ -81,6 +179,7 @@ def main():
     print(f"📂 Downloads: {args.downloads}")
     print(f"📂 Output: {args.output}")
     print(f"🔍 Zoom: {args.zoom}")
+    print(f"⚙️ Jobs: {args.jobs} ({args.mode})")
     print()
     
     # Find all available dates
@@ -117,9 +216,9 @@ def main():
     successful = 0
     failed = 0
     
-    for i, date in enumerate(dates_to_process, 1):
-        print(f"[{i}/{len(dates_to_process)}] Processing {date}")
-        
+    pending_dates = []
+    
+    for date in dates_to_process:
         # Check if world map already exists
         expected_filename = f"terra_complete_world_map_{date}_z{args.zoom}.jpg"
         expected_path = os.path.join(args.output, expected_filename)
@@ -127,22 +226,54 @@ def main():
         if os.path.exists(expected_path):
             print(f"⚡ World map already exists for {date}, skipping")
             successful += 1
-            continue
-        
-        # Generate world map
-        if generate_world_map_for_date(date, args.output, args.zoom):
-            successful += 1
         else:
-            failed += 1
+            pending_dates.append(date)
+    
+    if args.mode == 'stitch-then-encode':
+        # Stitch in long-lived worker processes instead of one interpreter per date
+        executor_class, worker = ProcessPoolExecutor, stitch_world_map_for_date
+    else:
+        # Each map is generated in its own subprocess, so threads are enough to keep N running
+        executor_class, worker = ThreadPoolExecutor, generate_world_map_for_date
+    
+    with executor_class(max_workers=max(1, args.jobs)) as executor:
+        futures = [
+            executor.submit(worker, date, args.output, args.zoom)
+            for date in pending_dates
+        ]
         
-        print(f"📊 Progress: {successful} successful, {failed} failed")
-        print()
+        for i, future in enumerate(as_completed(futures), 1):
+            date, success = future.result()
+            print(f"[{i}/{len(pending_dates)}] Processed {date}")
+            
+            if success:
+                successful += 1
+            else:
+                failed += 1
+            
+            print(f"📊 Progress: {successful} successful, {failed} failed")
+            print()
     
     print("🎉 Batch world map generation complete!")
     print(f"✅ Successfully generated: {successful} world maps")
     print(f"❌ Failed to generate: {failed} world maps")
     print(f"📊 Success rate: {(successful / len(dates_to_process) * 100):.1f}%")
     
+    if args.mode == 'stitch-then-encode':
+        map_paths = [
+            os.path.join(args.output, f"terra_complete_world_map_{date}_z{args.zoom}.jpg")
+            for date in dates_to_process
+        ]
+        map_paths = [path for path in map_paths if os.path.exists(path)]
+        
+        if not map_paths:
+            print("❌ No world maps available to encode")
+            return 1
+        
+        video_path = args.video or os.path.join(args.output, f"terra_world_maps_z{args.zoom}.mp4")
+        if not encode_world_maps_video(map_paths, video_path, args.fps):
+            return 1
+    
     return 0 if failed == 0 else 1
 
 if __name__ == "__main__":
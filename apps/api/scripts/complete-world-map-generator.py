@@ -6,20 +6,52 @@ Downloads and combines multiple Terra satellite tiles to create complete world m
 
 import os
 import sys
+import asyncio
+import io
+import tempfile
+import threading
+from pathlib import Path
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image, ImageDraw, ImageFont
 import math
 from datetime import datetime, timedelta
 import argparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+from contextlib import asynccontextmanager
+
+# libjpeg-turbo codec (optional, falls back to Pillow)
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420, TJSAMP_444
+    _tj = TurboJPEG()
+except Exception:  # Module missing or libturbojpeg not found
+    _tj = None
 
 class TerraWorldMapGenerator:
-    def __init__(self):
+    def __init__(self, backend='thread', use_cache=True, use_turbojpeg=False):
         self.base_url = "https://gibs.earthdata.nasa.gov/wmts/epsg4326/best"
         self.default_layer = "MODIS_Terra_CorrectedReflectance_TrueColor"
         self.default_resolution = "250m"
         self.tile_size = 256  # Standard WMTS tile size
+        self.backend = backend  # 'thread' (requests), 'asyncio' (aiohttp) or 'http2' (httpx)
+        self.use_cache = use_cache  # Read and write the persistent tile cache
+        self.cache_root = Path(os.environ.get('TERRA_CACHE', '~/.cache/terra')).expanduser()
+        self.session = self._create_session()
+        self._fonts = {}  # Loaded overlay fonts by pixel size
+        self._text_widths = {}  # Measured overlay text widths by (text, size)
+        self.use_turbojpeg = use_turbojpeg and _tj is not None  # Encode outputs with libjpeg-turbo
+    
+    def _create_session(self, pool_size=32):
+        """Create a keep-alive session shared by all tile downloads"""
+        session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session.mount('https://', adapter)
+        session.headers['Connection'] = 'keep-alive'
+        return session
         
     def calculate_world_tiles(self, zoom_level=4):
         """
@@ -44,33 +76,56 @@ class TerraWorldMapGenerator:
         resolution = resolution or self.default_resolution
         return f"{self.base_url}/{layer}/default/{date}/{resolution}/{z}/{y}/{x}.jpg"
     
-    def download_tile(self, date, z, x, y, output_dir, layer=None):
-        """Download a single Terra tile"""
+    def _cache_path(self, date, z, x, y, layer=None):
+        """Location of a tile in the persistent tile cache"""
+        layer = layer or self.default_layer
+        return self.cache_root / 'tiles' / layer / date / f"z{z}" / f"x{x}" / f"y{y}.jpg"
+    
+    def _cached_tile(self, date, z, x, y, layer=None):
+        """Return the cached tile path, or None on a miss or with the cache disabled"""
+        if not self.use_cache:
+            return None
+        cache_path = self._cache_path(date, z, x, y, layer)
+        if cache_path.exists() and cache_path.stat().st_size > 0:
+            return cache_path
+        return None
+    
+    def _store_tile(self, date, z, x, y, layer, data):
+        """Write tile bytes to the cache (via rename, concurrent runs may share the cache)"""
+        if not self.use_cache:
+            return
+        cache_path = self._cache_path(date, z, x, y, layer)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+    
+    def download_tile(self, date, z, x, y, layer=None):
+        """
+        Download a single Terra tile, returns (tile, success) where tile is
+        the cached tile path on a cache hit and the JPEG bytes otherwise
+        """
         try:
-            url = self.get_terra_tile_url(date, z, x, y, layer)
-            
-            # Create tile filename
-            tile_filename = f"tile_{z}_{x}_{y}.jpg"
-            tile_path = os.path.join(output_dir, tile_filename)
+            # Reuse the tile from an earlier run
+            cached_path = self._cached_tile(date, z, x, y, layer)
+            if cached_path:
+                return cached_path, True
             
-            # Skip if already downloaded
-            if os.path.exists(tile_path):
-                return tile_path, True
-            
-            response = requests.get(url, timeout=30)
+            url = self.get_terra_tile_url(date, z, x, y, layer)
+            response = self.session.get(url, timeout=30)
             if response.status_code == 200:
-                with open(tile_path, 'wb') as f:
-                    f.write(response.content)
-                return tile_path, True
-            else:
-                print(f" Failed to download tile {z}/{x}/{y}: HTTP {response.status_code}")
-                return None, False
+                self._store_tile(date, z, x, y, layer, response.content)
+                return response.content, True
+            
+            print(f" Failed to download tile {z}/{x}/{y}: HTTP {response.status_code}")
+            return None, False
                 
         except Exception as e:
             print(f" Error downloading tile {z}/{x}/{y}: {e}")
             return None, False
     
-    def download_all_tiles(self, date, zoom_level, output_dir, layer=None, max_workers=8):
+    def download_all_tiles(self, date, zoom_level, layer=None, max_workers=8):
         """Download all tiles needed for world map"""
         print(f" Downloading world tiles for {date} at zoom level {zoom_level}")
         
@@ -78,8 +133,14 @@ class TerraWorldMapGenerator:
         tiles = self.calculate_world_tiles(zoom_level)
         print(f" Total tiles needed: {len(tiles)}")
         
-        # Create output directory
-        os.makedirs(output_dir, exist_ok=True)
+        if self.backend in ('asyncio', 'http2'):
+            results = asyncio.run(self.download_tiles_async(date, tiles, layer))
+            successful_tiles = [tile for tile in results if tile[3]]
+            
+            print(f" Downloaded {len(successful_tiles)} tiles successfully")
+            print(f" Failed to download {len(tiles) - len(successful_tiles)} tiles")
+            
+            return successful_tiles
         
         successful_tiles = []
         failed_count = 0
@@ -88,7 +149,7 @@ class TerraWorldMapGenerator:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Submit all download tasks
             future_to_tile = {
-                executor.submit(self.download_tile, date, z, x, y, output_dir, layer): (z, x, y)
+                executor.submit(self.download_tile, date, z, x, y, layer): (z, x, y)
                 for z, x, y in tiles
             }
             
@@ -96,9 +157,9 @@ class TerraWorldMapGenerator:
             for i, future in enumerate(as_completed(future_to_tile)):
                 z, x, y = future_to_tile[future]
                 try:
-                    tile_path, success = future.result()
-                    if success and tile_path:
-                        successful_tiles.append((z, x, y, tile_path))
+                    tile, success = future.result()
+                    if success and tile:
+                        successful_tiles.append((z, x, y, tile))
                     else:
                         failed_count += 1
                     
@@ -116,6 +177,103 @@ class TerraWorldMapGenerator:
         
         return successful_tiles
     
+    @asynccontextmanager
+    async def _async_fetcher(self, concurrency):
+        """Yield get(url) -> (status, body) for the configured async backend"""
+        if self.backend == 'http2':
+            import httpx  # Only required for the http2 backend (httpx[http2])
+            
+            # A handful of HTTP/2 connections carry all requests as multiplexed streams
+            limits = httpx.Limits(max_connections=4, max_keepalive_connections=4)
+            async with httpx.AsyncClient(http2=True, limits=limits, timeout=30) as client:
+                async def get(url):
+                    response = await client.get(url)
+                    return response.status_code, response.content
+                yield get
+        else:
+            import aiohttp  # Only required for the asyncio backend
+            
+            connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+            timeout = aiohttp.ClientTimeout(total=30)
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                async def get(url):
+                    async with session.get(url) as response:
+                        if response.status != 200:
+                            return response.status, None
+                        return response.status, await response.read()
+                yield get
+    
+    async def download_tiles_async(self, date, tiles, layer=None, concurrency=64):
+        """Download tiles on a single event loop, returns [(z, x, y, tile)], tile is a path, JPEG bytes or None"""
+        semaphore = asyncio.Semaphore(concurrency)
+        completed = 0
+        
+        async with self._async_fetcher(concurrency) as get:
+            async def fetch(z, x, y):
+                nonlocal completed
+                try:
+                    cached_path = self._cached_tile(date, z, x, y, layer)
+                    if cached_path:
+                        return z, x, y, cached_path
+                    
+                    url = self.get_terra_tile_url(date, z, x, y, layer)
+                    async with semaphore:
+                        status, data = await get(url)
+                    
+                    if status != 200:
+                        print(f" Failed to download tile {z}/{x}/{y}: HTTP {status}")
+                        return z, x, y, None
+                    
+                    # Tiles are tens of KB, a blocking write is cheaper than a thread hop
+                    self._store_tile(date, z, x, y, layer, data)
+                    return z, x, y, data
+                    
+                except Exception as e:
+                    print(f" Error downloading tile {z}/{x}/{y}: {e}")
+                    return z, x, y, None
+                
+                finally:
+                    completed += 1
+                    if completed % 10 == 0:
+                        progress = (completed / len(tiles)) * 100
+                        print(f" Progress: {progress:.1f}% ({completed}/{len(tiles)} tiles)")
+            
+            return await asyncio.gather(*[fetch(z, x, y) for z, x, y in tiles])
+    
+    def _decode_tile(self, z, x, y, tile):
+        """
+        Decode a tile (path or in-memory JPEG bytes) into an RGB array
+        (libjpeg releases the GIL while decoding)
+        """
+        if not isinstance(tile, bytes):
+            with open(tile, 'rb') as f:
+                tile = f.read()
+        if _tj is not None:
+            pixels = _tj.decode(tile, pixel_format=TJPF_RGB)
+        else:
+            with Image.open(io.BytesIO(tile)) as img:
+                # GIBS JPEGs already decode to RGB, converting would only copy
+                pixels = np.asarray(img if img.mode == 'RGB' else img.convert('RGB'))
+        
+        # Catch anomalous layers (e.g. palettized or odd-sized tiles) before they reach the canvas
+        if pixels.shape != (self.tile_size, self.tile_size, 3) or pixels.dtype != np.uint8:
+            raise ValueError(f"unexpected tile shape {pixels.shape} ({pixels.dtype})")
+        return z, x, y, pixels
+    
+    def _save_jpeg(self, image, path, quality, chroma_subsampling=True):
+        """
+        Save an RGB image as JPEG, through libjpeg-turbo when enabled
+        (chroma_subsampling picks 4:2:0 vs 4:4:4 on that path)
+        """
+        if self.use_turbojpeg:
+            subsample = TJSAMP_420 if chroma_subsampling else TJSAMP_444
+            data = _tj.encode(np.asarray(image), quality=quality,
+                              pixel_format=TJPF_RGB, jpeg_subsample=subsample)
+            with open(path, 'wb') as f:
+                f.write(data)
+        else:
+            image.save(path, "JPEG", quality=quality)
+    
     def stitch_world_map(self, successful_tiles, zoom_level, output_path, date):
         """Stitch downloaded tiles into a complete world map"""
         print(f" Stitching {len(successful_tiles)} tiles into world map...")
@@ -131,93 +289,114 @@ class TerraWorldMapGenerator:
         
         print(f" World map size: {world_width}x{world_height} pixels")
         
-        # Create world map canvas
-        world_map = Image.new('RGB', (world_width, world_height), color=(0, 0, 50))  # Dark blue background
+        # Create a memory-mapped world map canvas (zoom 5 is 192 MiB of RGB pixels)
+        canvas_fd, canvas_path = tempfile.mkstemp(suffix='.canvas', dir=os.path.dirname(output_path) or None)
+        os.close(canvas_fd)
         
-        # Place each tile in the correct position
-        tiles_placed = 0
-        for z, x, y, tile_path in successful_tiles:
-            try:
-                # Load tile image
-                tile_img = Image.open(tile_path)
-                
-                # Calculate position on world map
-                tile_x = x * self.tile_size
-                tile_y = y * self.tile_size
-                
-                # Paste tile onto world map
-                world_map.paste(tile_img, (tile_x, tile_y))
-                tiles_placed += 1
-                
-                if tiles_placed % 20 == 0:
-                    progress = (tiles_placed / len(successful_tiles)) * 100
-                    print(f" Stitching progress: {progress:.1f}% ({tiles_placed}/{len(successful_tiles)} tiles)")
+        try:
+            canvas = np.memmap(canvas_path, dtype=np.uint8, mode='w+', shape=(world_height, world_width, 3))
+            # Track placed tiles so only the gaps get the background fill
+            placed = np.zeros((max_tile, max_tile), dtype=bool)
+            
+            # Decode tiles in parallel, placing each one as soon as it is ready
+            tiles_placed = 0
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                future_to_tile = {
+                    executor.submit(self._decode_tile, z, x, y, tile): (z, x, y)
+                    for z, x, y, tile in successful_tiles
+                }
                 
-            except Exception as e:
-                print(f" Error placing tile {z}/{x}/{y}: {e}")
-                continue
+                for future in as_completed(future_to_tile):
+                    z, x, y = future_to_tile[future]
+                    try:
+                        _, _, _, tile = future.result()
+                        
+                        # Calculate position on world map
+                        tile_x = x * self.tile_size
+                        tile_y = y * self.tile_size
+                        
+                        # Copy tile pixels into the canvas
+                        canvas[tile_y:tile_y + tile.shape[0], tile_x:tile_x + tile.shape[1]] = tile
+                        placed[y, x] = True
+                        tiles_placed += 1
+                        
+                        if tiles_placed % 20 == 0:
+                            progress = (tiles_placed / len(successful_tiles)) * 100
+                            print(f" Stitching progress: {progress:.1f}% ({tiles_placed}/{len(successful_tiles)} tiles)")
+                        
+                    except Exception as e:
+                        print(f" Error placing tile {z}/{x}/{y}: {e}")
+                        continue
+            
+            # Dark blue background for missing tiles
+            for y, x in zip(*np.nonzero(~placed)):
+                canvas[y * self.tile_size:(y + 1) * self.tile_size,
+                       x * self.tile_size:(x + 1) * self.tile_size] = (0, 0, 50)
+            
+            world_map = Image.fromarray(canvas)
+            del canvas
+        finally:
+            os.remove(canvas_path)
         
         print(f" Placed {tiles_placed} tiles successfully")
         
         # Add title and metadata
         self.add_world_map_overlay(world_map, date, zoom_level, tiles_placed)
         
-        # Resize for practical viewing (optional)
-        if world_width > 4000:  # If too large, create a smaller version
+        # Resize for practical viewing (zoom 4 and below is already display sized)
+        if world_width > 4096:  # If too large, create a smaller version
             print(" Creating web-friendly version...")
             display_width = 3840  # 4K width
             display_height = int(world_height * (display_width / world_width))
-            world_map_display = world_map.resize((display_width, display_height), Image.Resampling.LANCZOS)
+            # Box-reduce by an integer factor first, then a cheap bilinear pass to the final size
+            world_map_display = world_map.resize((display_width, display_height), Image.Resampling.BILINEAR,
+                                                 reducing_gap=2.0)
             
             # Save both versions
             display_path = output_path.replace('.jpg', '_display.jpg')
-            world_map_display.save(display_path, "JPEG", quality=90)
+            self._save_jpeg(world_map_display, display_path, quality=90)
             print(f" Saved display version: {display_path}")
         
         # Save full resolution world map
-        world_map.save(output_path, "JPEG", quality=95)
+        self._save_jpeg(world_map, output_path, quality=95, chroma_subsampling=False)
         print(f" Saved world map: {output_path}")
         
         return True
     
+    def _font(self, size):
+        """Return the overlay font at the given size, loading it only once"""
+        if size not in self._fonts:
+            try:
+                self._fonts[size] = ImageFont.truetype("arial.ttf", size)
+            except:
+                self._fonts[size] = ImageFont.load_default()
+        return self._fonts[size]
+    
+    def _text_width(self, text, size):
+        """Return the rendered width of text (advance width only, cached)"""
+        key = (text, size)
+        if key not in self._text_widths:
+            self._text_widths[key] = int(self._font(size).getlength(text))
+        return self._text_widths[key]
+    
     def add_world_map_overlay(self, world_map, date, zoom_level, tiles_count):
         """Add title and metadata overlay to world map"""
         draw = ImageDraw.Draw(world_map)
         
-        # Try to load fonts
-        try:
-            title_font = ImageFont.truetype("arial.ttf", 72)
-            subtitle_font = ImageFont.truetype("arial.ttf", 48)
-            info_font = ImageFont.truetype("arial.ttf", 36)
-        except:
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-            info_font = ImageFont.load_default()
-        
-        # Add semi-transparent overlay for text
-        overlay = Image.new('RGBA', world_map.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
-        
-        # Draw header background
+        title_font = self._font(72)
+        subtitle_font = self._font(48)
+        
+        # Draw solid header background straight onto the RGB map
         header_height = 150
-        overlay_draw.rectangle([0, 0, world_map.width, header_height], fill=(0, 0, 0, 180))
+        draw.rectangle([0, 0, world_map.width, header_height], fill=(0, 0, 30))
         
         # Add title text
         title = f"NASA Terra Satellite - Complete World Map"
         subtitle = f"Date: {date} | Zoom Level: {zoom_level} | Tiles: {tiles_count}"
         
         # Calculate text positions
-        title_bbox = draw.textbbox((0, 0), title, font=title_font)
-        title_width = title_bbox[2] - title_bbox[0]
-        title_x = (world_map.width - title_width) // 2
-        
-        subtitle_bbox = draw.textbbox((0, 0), subtitle, font=subtitle_font)
-        subtitle_width = subtitle_bbox[2] - subtitle_bbox[0]
-        subtitle_x = (world_map.width - subtitle_width) // 2
-        
-        # Composite overlay
-        world_map = Image.alpha_composite(world_map.convert('RGBA'), overlay).convert('RGB')
-        draw = ImageDraw.Draw(world_map)
+        title_x = (world_map.width - self._text_width(title, 72)) // 2
+        subtitle_x = (world_map.width - self._text_width(subtitle, 48)) // 2
         
         # Draw text with shadow
         draw.text((title_x + 3, 33), title, font=title_font, fill=(0, 0, 0))
@@ -231,7 +410,7 @@ class TerraWorldMapGenerator:
     
     def add_coordinate_grid(self, draw, width, height):
         """Add coordinate grid lines to world map"""
-        grid_color = (100, 100, 150, 100)
+        grid_color = (100, 100, 150)  # Opaque, drawn directly on the RGB map
         
         # Add longitude lines
         for i in range(1, 8):
@@ -248,14 +427,12 @@ class TerraWorldMapGenerator:
         print(f" Generating complete world map for {date}")
         print(f" Zoom level: {zoom_level} ({2**zoom_level}x{2**zoom_level} = {(2**zoom_level)**2} tiles)")
         
-        # Create temporary tiles directory
-        tiles_dir = os.path.join(output_dir, f"temp_tiles_{date}")
-        os.makedirs(tiles_dir, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
         
         try:
             # Download all tiles
             successful_tiles = self.download_all_tiles(
-                date, zoom_level, tiles_dir, layer
+                date, zoom_level, layer
             )
             
             if not successful_tiles:
@@ -274,15 +451,6 @@ class TerraWorldMapGenerator:
         except Exception as e:
             print(f" Error generating world map: {e}")
             return False
-        
-        finally:
-            # Cleanup temporary tiles (optional - comment out to keep tiles)
-            print(" Cleaning up temporary tiles...")
-            import shutil
-            try:
-                shutil.rmtree(tiles_dir)
-            except:
-                pass
 
 def main():
     parser = argparse.ArgumentParser(description="Generate complete Terra world maps")
@@ -290,6 +458,12 @@ def main():
     parser.add_argument("--output", "-o", required=True, help="Output directory")
     parser.add_argument("--zoom", "-z", type=int, default=3, help="Zoom level (2-5, default: 3)")
     parser.add_argument("--layer", "-l", help="Terra layer name")
+    parser.add_argument("--backend", choices=['thread', 'asyncio', 'http2'], default='thread',
+                        help="Tile download backend (asyncio requires aiohttp, http2 requires httpx[http2])")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the tile cache ($TERRA_CACHE, default ~/.cache/terra) and re-download every tile")
+    parser.add_argument("--turbojpeg", action="store_true",
+                        help="Encode output JPEGs with libjpeg-turbo (requires PyTurboJPEG)")
     
     args = parser.parse_args()
     
@@ -297,7 +471,8 @@ def main():
         print("ERROR: Zoom level must be between 2 and 5")
         return 1
     
-    generator = TerraWorldMapGenerator()
+    generator = TerraWorldMapGenerator(backend=args.backend, use_cache=not args.no_cache,
+                                       use_turbojpeg=args.turbojpeg)
     
     print(f"Terra Complete World Map Generator")
     print(f"Date: {args.date}")
@@ -5,71 +5,123 @@ Downloads high-quality images directly from NASA GIBS WMTS service
 """
 
 import os
+import re
 import sys
+import json
+import shutil
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 from PIL import Image
 from datetime import datetime
+from pathlib import Path
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from gibs_layers import LAYERS
 
 class DirectGIBSDownloader:
-    def __init__(self):
+    def __init__(self, encode_quality=None, encode_fast=False):
         self.base_url = "https://gibs.earthdata.nasa.gov/wmts/epsg4326/best"
+        self.max_workers = int(os.environ.get("GIBS_WORKERS", 16))
+        self.session = self._create_session(self.max_workers)
+        self.cache_root = Path(os.environ.get("GIBS_CACHE", "~/.cache/gibs")).expanduser()
         
-        self.layers = {
-            "terra_true_color": {
-                "id": "MODIS_Terra_CorrectedReflectance_TrueColor",
-                "resolution": "250m",
-                "format": "jpg"
-            },
-            "terra_false_color": {
-                "id": "MODIS_Terra_CorrectedReflectance_Bands367", 
-                "resolution": "250m",
-                "format": "jpg"
-            },
-            "terra_bands721": {
-                "id": "MODIS_Terra_CorrectedReflectance_Bands721",
-                "resolution": "250m", 
-                "format": "jpg"
-            },
-            "aqua_true_color": {
-                "id": "MODIS_Aqua_CorrectedReflectance_TrueColor",
-                "resolution": "250m",
-                "format": "jpg"
-            },
-            "viirs_true_color": {
-                "id": "VIIRS_SNPP_CorrectedReflectance_TrueColor",
-                "resolution": "250m",
-                "format": "jpg"
-            }
-        }
+        # Fast encoding is meant for previews that get re-encoded downstream
+        self.encode_fast = encode_fast
+        self.encode_quality = encode_quality or (85 if encode_fast else 95)
+        
+        self.layers = LAYERS
     
-    def download_single_tile(self, layer_key, date, z, x, y, output_path):
-        """Download a single WMTS tile"""
+    def _create_session(self, pool_size):
+        """Create a keep-alive session shared by all tile downloads"""
+        session = requests.Session()
+        # ACCEPT_ENCODING only advertises br/zstd when urllib3 can decode them
+        session.headers.update({
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Connection": "keep-alive",
+            "User-Agent": "terra-data-gibs/1.0"
+        })
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+        # pool_block=False: a worker never waits for a free socket, it opens an extra one instead
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+        session.mount('https://', adapter)
+        return session
+    
+    def _load_validators(self, meta_path):
+        """Conditional request headers from the cached tile's ETag / Last-Modified"""
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+    
+    def fetch_tile(self, layer_key, date, z, x, y):
+        """
+        Fetch a single WMTS tile into the on-disk cache, revalidating the
+        cached copy with a conditional GET (a 304 reuses the cached tile
+        without a body). The body is streamed to disk rather than buffered.
+        Returns the cached tile path, or None if the download failed
+        """
         if layer_key not in self.layers:
             raise ValueError(f"Unknown layer: {layer_key}")
         
-        layer_info = self.layers[layer_key]
-        layer_id = layer_info["id"]
-        resolution = layer_info["resolution"]
-        format_ext = layer_info["format"]
+        layer = self.layers[layer_key]
+        layer_id = layer.id
+        resolution = layer.resolution
+        format_ext = layer.format
         
         url = f"{self.base_url}/{layer_id}/default/{date}/{resolution}/{z}/{y}/{x}.{format_ext}"
         
+        cache_dir = self.cache_root / layer_id / date / str(z)
+        cache_path = cache_dir / f"{x}_{y}.{format_ext}"
+        meta_path = cache_dir / f"{x}_{y}.json"
+        headers = self._load_validators(meta_path) if cache_path.exists() else {}
+        
         print(f"Downloading: {url}")
         
         try:
-            response = requests.get(url, timeout=30)
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-                print(f"Successfully downloaded: {output_path}")
-                return True
-            else:
-                print(f"Download failed: HTTP {response.status_code}")
-                return False
+            with self.session.get(url, timeout=30, headers=headers, stream=True) as response:
+                if response.status_code == 304:
+                    print(f"Not modified, using cached tile: {cache_path}")
+                    return cache_path
+                elif response.status_code == 200:
+                    cache_dir.mkdir(parents=True, exist_ok=True)
+                    # Write beside the cache entry and swap it in, so a failed transfer never leaves a truncated tile
+                    part_path = cache_dir / f"{x}_{y}.{format_ext}.part"
+                    response.raw.decode_content = True
+                    with open(part_path, 'wb') as f:
+                        shutil.copyfileobj(response.raw, f, 64 * 1024)
+                    os.replace(part_path, cache_path)
+                    with open(meta_path, 'w') as f:
+                        json.dump({
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified")
+                        }, f)
+                    return cache_path
+                else:
+                    print(f"Download failed: HTTP {response.status_code}")
+                    return None
         except Exception as e:
             print(f"Error downloading: {e}")
+            return None
+    
+    def download_single_tile(self, layer_key, date, z, x, y, output_path):
+        """Download a single WMTS tile to output_path"""
+        cache_path = self.fetch_tile(layer_key, date, z, x, y)
+        if cache_path is None:
             return False
+        
+        shutil.copyfile(cache_path, output_path)
+        print(f"Successfully downloaded: {output_path}")
+        return True
     
     def download_region_grid(self, layer_key, date, zoom_level, x_min, x_max, y_min, y_max, output_dir):
         """Download a grid of tiles for a region"""
@@ -81,12 +133,21 @@ class DirectGIBSDownloader:
         successful = 0
         failed = 0
         
+        tasks = []
         for x in range(x_min, x_max + 1):
             for y in range(y_min, y_max + 1):
-                tile_filename = f"{layer_key}_{date}_z{zoom_level}_x{x}_y{y}.{self.layers[layer_key]['format']}"
-                tile_path = os.path.join(output_dir, tile_filename)
-                
-                if self.download_single_tile(layer_key, date, zoom_level, x, y, tile_path):
+                tile_filename = f"{layer_key}_{date}_z{zoom_level}_x{x}_y{y}.{self.layers[layer_key].format}"
+                tasks.append((x, y, os.path.join(output_dir, tile_filename)))
+        
+        # Tiles are independent and RTT-bound, so fetch them concurrently over the pooled session
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self.download_single_tile, layer_key, date, zoom_level, x, y, tile_path)
+                for x, y, tile_path in tasks
+            ]
+            
+            for future in as_completed(futures):
+                if future.result():
                     successful += 1
                 else:
                     failed += 1
@@ -105,21 +166,19 @@ class DirectGIBSDownloader:
     
     def create_composite_image(self, layer_key, date, zoom_level, tile_dir, output_path, target_width=3840, target_height=2160):
         """Create a composite image from downloaded tiles"""
-        layer_info = self.layers[layer_key]
-        format_ext = layer_info["format"]
+        layer = self.layers[layer_key]
+        format_ext = layer.format
         
-        # Find all tiles in directory
+        # Find all tiles in directory (named by download_region_grid)
+        tile_re = re.compile(
+            rf"{re.escape(layer_key)}_{re.escape(date)}_z{zoom_level}_x(\d+)_y(\d+)\.{re.escape(format_ext)}$"
+        )
         tiles = []
-        for filename in os.listdir(tile_dir):
-            if filename.startswith(f"{layer_key}_{date}_z{zoom_level}") and filename.endswith(f".{format_ext}"):
-                # Extract x, y from filename
-                parts = filename.replace(f".{format_ext}", "").split("_")
-                for i, part in enumerate(parts):
-                    if part.startswith("x"):
-                        x = int(part[1:])
-                        y = int(parts[i+1][1:])
-                        tiles.append((x, y, os.path.join(tile_dir, filename)))
-                        break
+        with os.scandir(tile_dir) as entries:
+            for entry in entries:
+                match = tile_re.match(entry.name)
+                if match:
+                    tiles.append((int(match[1]), int(match[2]), entry.path))
         
         if not tiles:
             print("No tiles found for composite")
@@ -129,66 +188,142 @@ class DirectGIBSDownloader:
         
         # Calculate grid dimensions
         max_tile = 2 ** zoom_level
-        tile_size = 256
-        
-        # Create composite image
-        composite_width = max_tile * tile_size
-        composite_height = max_tile * tile_size
-        
-        print(f"Composite size: {composite_width}x{composite_height}")
-        
-        composite = Image.new('RGB', (composite_width, composite_height), (0, 0, 50))
+        composite = self._new_composite(max_tile, target_width, target_height)
         
         # Place tiles
-        tiles_placed = 0
+        placed = set()
         for x, y, tile_path in tiles:
             try:
-                tile_img = Image.open(tile_path)
-                composite.paste(tile_img, (x * tile_size, y * tile_size))
-                tiles_placed += 1
+                with Image.open(tile_path) as tile_img:
+                    self._place_tile(composite, tile_img, x, y, max_tile)
+                placed.add((x, y))
             except Exception as e:
                 print(f"Error placing tile {x},{y}: {e}")
         
-        print(f"Placed {tiles_placed} tiles")
+        print(f"Placed {len(placed)} tiles")
+        self._fill_missing(composite, placed, max_tile)
         
-        # Resize to target dimensions
+        return self._save_composite(composite, output_path)
+    
+    def _new_composite(self, max_tile, target_width=None, target_height=None):
+        """
+        Create the composite canvas. With a target size the canvas is built
+        at that size directly and tiles are resampled as they are placed,
+        instead of stitching a full-resolution mosaic and resizing it.
+        The canvas is left uninitialised; _fill_missing paints the background
+        only where no tile was placed
+        """
         if target_width and target_height:
-            composite = composite.resize((target_width, target_height), Image.Resampling.LANCZOS)
-            print(f"Resized to {target_width}x{target_height}")
+            size = (target_width, target_height)
+        else:
+            size = (max_tile * 256, max_tile * 256)
+        
+        print(f"Composite size: {size[0]}x{size[1]}")
+        return Image.new('RGB', size, None)
+    
+    def _fill_missing(self, composite, placed, max_tile):
+        """Paint the background colour into the box of every tile that was not placed"""
+        for x in range(max_tile):
+            for y in range(max_tile):
+                if (x, y) not in placed:
+                    box = self._tile_box(composite.size, x, y, max_tile)
+                    composite.paste((0, 0, 50), box)
+    
+    def _tile_box(self, size, x, y, max_tile):
+        """Pixel box (left, top, right, bottom) of tile (x, y) in a composite of the given size"""
+        # Rounded edges keep neighbouring tiles seamless for non-integer scale factors
+        width, height = size
+        return (
+            round(x * width / max_tile),
+            round(y * height / max_tile),
+            round((x + 1) * width / max_tile),
+            round((y + 1) * height / max_tile)
+        )
+    
+    def _fit_tile(self, tile_img, box):
+        """Decode a tile and resample it to the size of its composite box"""
+        size = (box[2] - box[0], box[3] - box[1])
+        if tile_img.size == size:
+            tile_img.load()
+            return tile_img
         
+        # For JPEG tiles, let libjpeg decode at the nearest 1/2, 1/4 or 1/8 scale first (no-op for PNG)
+        tile_img.draft('RGB', size)
+        return tile_img.resize(size, Image.Resampling.LANCZOS)
+    
+    def _place_tile(self, composite, tile_img, x, y, max_tile):
+        """Paste tile (x, y) into its slice of the composite, resampling it to fit"""
+        box = self._tile_box(composite.size, x, y, max_tile)
+        composite.paste(self._fit_tile(tile_img, box), box[:2])
+    
+    def _fetch_fitted_tile(self, layer_key, date, z, x, y, box):
+        """Fetch a tile and decode/resample it for its composite box, or None if the download failed"""
+        cache_path = self.fetch_tile(layer_key, date, z, x, y)
+        if cache_path is None:
+            return None
+        
+        with Image.open(cache_path) as tile_img:
+            return self._fit_tile(tile_img, box)
+    
+    def _save_composite(self, composite, output_path):
+        """Save the finished composite"""
         # Save composite
-        composite.save(output_path, quality=95)
+        if self.encode_fast:
+            composite.save(output_path, quality=self.encode_quality, subsampling=2, optimize=False, progressive=False)
+        else:
+            composite.save(output_path, quality=self.encode_quality)
         print(f"Saved composite: {output_path}")
         
         return True
     
     def download_and_composite(self, layer_key, date, zoom_level, output_path, target_width=3840, target_height=2160):
-        """Download tiles and create composite in one operation"""
-        # Create temp directory for tiles
-        temp_dir = f"temp_tiles_{layer_key}_{date}_{zoom_level}"
+        """Download tiles and create composite in one operation, decoding tiles straight from memory"""
+        if layer_key not in self.layers:
+            raise ValueError(f"Unknown layer: {layer_key}")
         
-        try:
-            # Download tiles
-            print(f"Downloading {layer_key} tiles for {date} at zoom {zoom_level}")
-            successful, failed = self.download_global_coverage(layer_key, date, zoom_level, temp_dir)
-            
-            if successful == 0:
-                print("No tiles downloaded successfully")
-                return False
-            
-            # Create composite
-            return self.create_composite_image(layer_key, date, zoom_level, temp_dir, output_path, target_width, target_height)
+        max_tile = 2 ** zoom_level
+        
+        print(f"Downloading {layer_key} tiles for {date} at zoom {zoom_level}")
+        
+        composite = self._new_composite(max_tile, target_width, target_height)
+        
+        # Workers fetch, decode and resample each tile (Pillow releases the GIL while
+        # decoding), so CPU work overlaps the downloads; this thread only pastes
+        placed = set()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_box = {}
+            for x in range(max_tile):
+                for y in range(max_tile):
+                    box = self._tile_box(composite.size, x, y, max_tile)
+                    future = executor.submit(self._fetch_fitted_tile, layer_key, date, zoom_level, x, y, box)
+                    future_to_box[future] = (x, y, box)
             
-        finally:
-            # Clean up temp files (optional)
-            import shutil
-            try:
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
-                    print(f"Cleaned up temporary directory: {temp_dir}")
-            except:
-                pass
-
+            for future in as_completed(future_to_box):
+                x, y, box = future_to_box[future]
+                try:
+                    tile_img = future.result()
+                except Exception as e:
+                    print(f"Error placing tile {x},{y}: {e}")
+                    failed += 1
+                    continue
+                
+                if tile_img is None:
+                    failed += 1
+                    continue
+                
+                composite.paste(tile_img, box[:2])
+                placed.add((x, y))
+        
+        print(f"Region download complete: {len(placed)} placed, {failed} failed")
+        
+        if not placed:
+            print("No tiles downloaded successfully")
+            return False
+        
+        self._fill_missing(composite, placed, max_tile)
+        
+        return self._save_composite(composite, output_path)
 
 def main():
     parser = argparse.ArgumentParser(description="Download images directly from NASA GIBS")
@@ -198,17 +333,19 @@ def main():
     parser.add_argument("--zoom", "-z", type=int, default=2, help="Zoom level (0-5)")
     parser.add_argument("--width", "-w", type=int, default=3840, help="Target width")
     parser.add_argument("--height", type=int, default=2160, help="Target height")
+    parser.add_argument("--encode-quality", type=int, help="JPEG quality for the composite (default 95, or 85 with --encode-fast)")
+    parser.add_argument("--encode-fast", action="store_true", help="Fast 4:2:0 JPEG encode for previews")
     parser.add_argument("--list-layers", action="store_true", help="List available layers")
     
     args = parser.parse_args()
     
-    downloader = DirectGIBSDownloader()
+    downloader = DirectGIBSDownloader(args.encode_quality, args.encode_fast)
     
     if args.list_layers:
         print("Available Layers:")
         print("================")
         for key, info in downloader.layers.items():
-            print(f"{key:20} | {info['id']}")
+            print(f"{key:20} | {info.id}")
         return 0
     
     print(f"NASA GIBS Direct Downloader")
@@ -7,72 +7,106 @@ Supports GIBS WMTS, WMS, and other NASA imaging services
 
 import os
 import sys
+import asyncio
+import math
+from itertools import product
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 import json
 from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime, timedelta
 import argparse
 from urllib.parse import urlencode
 import time
+from io import BytesIO
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from gibs_layers import LAYERS
+
+# Predefined regions: (min_lon, min_lat, max_lon, max_lat)
+REGIONS = {
+    "global": (-180, -90, 180, 90),
+    "north_america": (-140, 20, -50, 70),
+    "europe": (-15, 35, 40, 70),
+    "asia": (60, 10, 150, 55),
+    "africa": (-20, -35, 55, 35),
+    "south_america": (-85, -55, -35, 15),
+    "australia": (110, -45, 155, -10),
+    "arctic": (-180, 60, 180, 90),
+    "antarctic": (-180, -90, 180, -60)
+}
 
 class EarthdataImageExporter:
-    def __init__(self):
+    def __init__(self, use_http2=False):
         self.gibs_wmts_base = "https://gibs.earthdata.nasa.gov/wmts/epsg4326/best"
         self.gibs_wms_base = "https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi"
         self.worldview_api = "https://worldview.earthdata.nasa.gov/api/v1"
+        self.max_workers = int(os.environ.get("GIBS_WORKERS", 16))
+        self.session = self._create_session(self.max_workers)
+        self.use_http2 = use_http2  # Fetch WMTS tiles over one multiplexed HTTP/2 connection (httpx[http2])
         
-        # Available layers with their metadata
-        self.layers = {
-            "terra_true_color": {
-                "id": "MODIS_Terra_CorrectedReflectance_TrueColor",
-                "name": "Terra True Color",
-                "resolution": "250m",
-                "format": "jpg"
-            },
-            "terra_false_color": {
-                "id": "MODIS_Terra_CorrectedReflectance_Bands367",
-                "name": "Terra False Color (3-6-7)",
-                "resolution": "250m",
-                "format": "jpg"
-            },
-            "terra_bands721": {
-                "id": "MODIS_Terra_CorrectedReflectance_Bands721",
-                "name": "Terra Bands 7-2-1",
-                "resolution": "250m",
-                "format": "jpg"
-            },
-            "terra_aerosol": {
-                "id": "MODIS_Terra_Aerosol",
-                "name": "Terra Aerosol Optical Depth",
-                "resolution": "1km",
-                "format": "png"
-            },
-            "terra_lst": {
-                "id": "MODIS_Terra_Land_Surface_Temp_Day",
-                "name": "Terra Land Surface Temperature (Day)",
-                "resolution": "1km",
-                "format": "png"
-            },
-            "terra_snow": {
-                "id": "MODIS_Terra_Snow_Cover",
-                "name": "Terra Snow Cover",
-                "resolution": "500m",
-                "format": "png"
-            },
-            "aqua_true_color": {
-                "id": "MODIS_Aqua_CorrectedReflectance_TrueColor",
-                "name": "Aqua True Color",
-                "resolution": "250m",
-                "format": "jpg"
-            },
-            "viirs_true_color": {
-                "id": "VIIRS_SNPP_CorrectedReflectance_TrueColor",
-                "name": "VIIRS True Color",
-                "resolution": "250m",
-                "format": "jpg"
-            }
-        }
+        self.layers = LAYERS
+    
+    def _create_session(self, pool_size):
+        """Create a keep-alive session shared by all requests"""
+        session = requests.Session()
+        # ACCEPT_ENCODING only advertises br/zstd when urllib3 can decode them
+        session.headers.update({
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Connection": "keep-alive",
+            "User-Agent": "terra-data-gibs/1.0"
+        })
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+        # pool_block=False: a worker never waits for a free socket, it opens an extra one instead
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+        session.mount('https://', adapter)
+        return session
+    
+    def _tile_url(self, layer_id, date, resolution, zoom_level, tile_x, tile_y, format_ext):
+        """WMTS REST URL of a single tile"""
+        return f"{self.gibs_wmts_base}/{layer_id}/default/{date}/{resolution}/{zoom_level}/{tile_y}/{tile_x}.{format_ext}"
+    
+    def _open_tile(self, tile_x, tile_y, status_code, content):
+        """Decode a tile response, returning (tile_x, tile_y, image) or None"""
+        if status_code != 200:
+            print(f"Failed to download tile {tile_x}/{tile_y}: HTTP {status_code}")
+            return None
+        
+        tile_img = Image.open(BytesIO(content))
+        tile_img.load()
+        print(f"Downloaded tile {tile_x}/{tile_y}")
+        return tile_x, tile_y, tile_img
+    
+    def _fetch_one_tile(self, layer_id, date, resolution, zoom_level, tile_x, tile_y, format_ext):
+        """Download a single WMTS tile, returning (tile_x, tile_y, image) or None"""
+        tile_url = self._tile_url(layer_id, date, resolution, zoom_level, tile_x, tile_y, format_ext)
+        
+        try:
+            response = self.session.get(tile_url, timeout=30)
+            return self._open_tile(tile_x, tile_y, response.status_code, response.content)
+        except Exception as e:
+            print(f"Error downloading tile {tile_x}/{tile_y}: {e}")
+        return None
+    
+    async def _fetch_tiles_async(self, layer_id, date, resolution, zoom_level, tiles, format_ext, concurrency=64):
+        """Download tiles as multiplexed streams on a single HTTP/2 connection"""
+        import httpx  # Only required with use_http2 (httpx[http2])
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        async with httpx.AsyncClient(http2=True, limits=limits, timeout=30) as client:
+            async def fetch(tile_x, tile_y):
+                tile_url = self._tile_url(layer_id, date, resolution, zoom_level, tile_x, tile_y, format_ext)
+                try:
+                    async with semaphore:
+                        response = await client.get(tile_url)
+                    return self._open_tile(tile_x, tile_y, response.status_code, response.content)
+                except Exception as e:
+                    print(f"Error downloading tile {tile_x}/{tile_y}: {e}")
+                    return None
+            
+            return await asyncio.gather(*[fetch(tile_x, tile_y) for tile_x, tile_y in tiles])
     
     def export_wmts_image(self, layer_key, date, bbox, width, height, output_path):
         """
@@ -82,11 +116,11 @@ class EarthdataImageExporter:
         if layer_key not in self.layers:
             raise ValueError(f"Unknown layer: {layer_key}")
         
-        layer_info = self.layers[layer_key]
-        layer_id = layer_info["id"]
-        resolution = layer_info["resolution"]
+        layer = self.layers[layer_key]
+        layer_id = layer.id
+        resolution = layer.resolution
         
-        print(f"Exporting {layer_info['name']} for {date}")
+        print(f"Exporting {layer.name} for {date}")
         print(f"Bounding box: {bbox}")
         print(f"Size: {width}x{height}")
         
@@ -96,21 +130,22 @@ class EarthdataImageExporter:
         # Get all tiles needed for the bounding box
         tiles = self.get_tiles_for_bbox(bbox, zoom_level)
         
-        # Download tiles
+        # Download tiles concurrently (tile fetches are RTT-bound)
         tile_images = []
-        for tile_x, tile_y in tiles:
-            tile_url = f"{self.gibs_wmts_base}/{layer_id}/default/{date}/{resolution}/{zoom_level}/{tile_y}/{tile_x}.{layer_info['format']}"
-            
-            try:
-                response = requests.get(tile_url, timeout=30)
-                if response.status_code == 200:
-                    tile_img = Image.open(BytesIO(response.content))
-                    tile_images.append((tile_x, tile_y, tile_img))
-                    print(f"Downloaded tile {tile_x}/{tile_y}")
-                else:
-                    print(f"Failed to download tile {tile_x}/{tile_y}: HTTP {response.status_code}")
-            except Exception as e:
-                print(f"Error downloading tile {tile_x}/{tile_y}: {e}")
+        if self.use_http2:
+            results = asyncio.run(self._fetch_tiles_async(layer_id, date, resolution, zoom_level, tiles, layer.format))
+            tile_images = [tile for tile in results if tile is not None]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(self._fetch_one_tile, layer_id, date, resolution, zoom_level, tile_x, tile_y, layer.format)
+                    for tile_x, tile_y in tiles
+                ]
+                
+                for future in as_completed(futures):
+                    tile = future.result()
+                    if tile is not None:
+                        tile_images.append(tile)
         
         # Stitch tiles together
         if tile_images:
@@ -122,42 +157,56 @@ class EarthdataImageExporter:
             print("No tiles downloaded successfully")
             return False
     
-    def export_wms_image(self, layer_key, date, bbox, width, height, output_path):
+    def _build_wms_base(self, layer_key, bbox, width, height):
         """
-        Export image using WMS (Web Map Service) - single request for entire image
-        bbox: [min_lon, min_lat, max_lon, max_lat]
+        Build the WMS GetMap URL for everything except TIME, so a time
+        series encodes it once and appends f"&TIME={date}" per day
         """
         if layer_key not in self.layers:
             raise ValueError(f"Unknown layer: {layer_key}")
         
-        layer_info = self.layers[layer_key]
-        layer_id = layer_info["id"]
-        
-        print(f"Exporting {layer_info['name']} via WMS for {date}")
-        print(f"Bounding box: {bbox}")
-        print(f"Size: {width}x{height}")
+        layer = self.layers[layer_key]
+        layer_id = layer.id
         
         # Build WMS request parameters
         params = {
             'SERVICE': 'WMS',
             'VERSION': '1.3.0',
             'REQUEST': 'GetMap',
-            'FORMAT': f"image/{layer_info['format']}",
+            'FORMAT': f"image/{layer.format}",
             'TRANSPARENT': 'true',
             'LAYERS': layer_id,
             'CRS': 'EPSG:4326',
             'STYLES': '',
             'WIDTH': width,
             'HEIGHT': height,
-            'BBOX': f"{bbox[1]},{bbox[0]},{bbox[3]},{bbox[2]}",  # WMS 1.3.0 uses lat,lon order
-            'TIME': date
+            'BBOX': f"{bbox[1]},{bbox[0]},{bbox[3]},{bbox[2]}"  # WMS 1.3.0 uses lat,lon order
         }
         
-        url = f"{self.gibs_wms_base}?{urlencode(params)}"
+        return f"{self.gibs_wms_base}?{urlencode(params)}"
+    
+    def export_wms_image(self, layer_key, date, bbox, width, height, output_path, base_url=None):
+        """
+        Export image using WMS (Web Map Service) - single request for entire image
+        bbox: [min_lon, min_lat, max_lon, max_lat]
+        base_url: prebuilt _build_wms_base() URL for the same layer/bbox/size
+        """
+        if layer_key not in self.layers:
+            raise ValueError(f"Unknown layer: {layer_key}")
+        
+        layer = self.layers[layer_key]
+        
+        print(f"Exporting {layer.name} via WMS for {date}")
+        print(f"Bounding box: {bbox}")
+        print(f"Size: {width}x{height}")
+        
+        if base_url is None:
+            base_url = self._build_wms_base(layer_key, bbox, width, height)
+        url = f"{base_url}&TIME={date}"
         print(f"WMS URL: {url}")
         
         try:
-            response = requests.get(url, timeout=60)
+            response = self.session.get(url, timeout=60)
             if response.status_code == 200:
                 with open(output_path, 'wb') as f:
                     f.write(response.content)
@@ -171,36 +220,49 @@ class EarthdataImageExporter:
             print(f"Error making WMS request: {e}")
             return False
     
-    def export_worldview_snapshot(self, layer_key, date, bbox, width, height, output_path):
+    def _build_worldview_base(self, layer_key, bbox, width, height):
         """
-        Export image using NASA Worldview snapshot API
+        Build the Worldview snapshot URL for everything except TIME
         """
         if layer_key not in self.layers:
             raise ValueError(f"Unknown layer: {layer_key}")
         
-        layer_info = self.layers[layer_key]
-        layer_id = layer_info["id"]
-        
-        print(f"Exporting {layer_info['name']} via Worldview API for {date}")
+        layer = self.layers[layer_key]
+        layer_id = layer.id
         
         # Worldview snapshot parameters
         params = {
             'REQUEST': 'GetSnapshot',
-            'TIME': date,
             'BBOX': f"{bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]}",
             'CRS': 'EPSG:4326',
             'LAYERS': layer_id,
             'WRAP': 'day',
-            'FORMAT': f"image/{layer_info['format']}",
+            'FORMAT': f"image/{layer.format}",
             'WIDTH': width,
             'HEIGHT': height,
             'AUTOSCALE': 'TRUE'
         }
         
-        url = f"{self.worldview_api}/snapshot?{urlencode(params)}"
+        return f"{self.worldview_api}/snapshot?{urlencode(params)}"
+    
+    def export_worldview_snapshot(self, layer_key, date, bbox, width, height, output_path, base_url=None):
+        """
+        Export image using NASA Worldview snapshot API
+        base_url: prebuilt _build_worldview_base() URL for the same layer/bbox/size
+        """
+        if layer_key not in self.layers:
+            raise ValueError(f"Unknown layer: {layer_key}")
+        
+        layer = self.layers[layer_key]
+        
+        print(f"Exporting {layer.name} via Worldview API for {date}")
+        
+        if base_url is None:
+            base_url = self._build_worldview_base(layer_key, bbox, width, height)
+        url = f"{base_url}&TIME={date}"
         
         try:
-            response = requests.get(url, timeout=120)
+            response = self.session.get(url, timeout=120)
             if response.status_code == 200:
                 with open(output_path, 'wb') as f:
                     f.write(response.content)
@@ -213,33 +275,25 @@ class EarthdataImageExporter:
             print(f"Error making Worldview request: {e}")
             return False
     
-    def export_region_image(self, layer_key, date, region, width, height, output_path, method="wms"):
+    def get_region_bbox(self, region):
+        """Bounding box (min_lon, min_lat, max_lon, max_lat) of a predefined region"""
+        try:
+            return REGIONS[region]
+        except KeyError:
+            raise ValueError(f"Unknown region: {region}. Available: {list(REGIONS.keys())}") from None
+    
+    def export_region_image(self, layer_key, date, region, width, height, output_path, method="wms", base_url=None):
         """
         Export image for a predefined region
         """
-        regions = {
-            "global": [-180, -90, 180, 90],
-            "north_america": [-140, 20, -50, 70],
-            "europe": [-15, 35, 40, 70],
-            "asia": [60, 10, 150, 55],
-            "africa": [-20, -35, 55, 35],
-            "south_america": [-85, -55, -35, 15],
-            "australia": [110, -45, 155, -10],
-            "arctic": [-180, 60, 180, 90],
-            "antarctic": [-180, -90, 180, -60]
-        }
-        
-        if region not in regions:
-            raise ValueError(f"Unknown region: {region}. Available: {list(regions.keys())}")
-        
-        bbox = regions[region]
+        bbox = self.get_region_bbox(region)
         
         if method == "wms":
-            return self.export_wms_image(layer_key, date, bbox, width, height, output_path)
+            return self.export_wms_image(layer_key, date, bbox, width, height, output_path, base_url)
         elif method == "wmts":
             return self.export_wmts_image(layer_key, date, bbox, width, height, output_path)
         elif method == "worldview":
-            return self.export_worldview_snapshot(layer_key, date, bbox, width, height, output_path)
+            return self.export_worldview_snapshot(layer_key, date, bbox, width, height, output_path, base_url)
         else:
             raise ValueError(f"Unknown method: {method}")
     
@@ -252,23 +306,41 @@ class EarthdataImageExporter:
         
         os.makedirs(output_dir, exist_ok=True)
         
-        current = start
+        # Only TIME varies between days, so encode the rest of the request URL once
+        base_url = None
+        if method == "wms":
+            base_url = self._build_wms_base(layer_key, self.get_region_bbox(region), width, height)
+        elif method == "worldview":
+            base_url = self._build_worldview_base(layer_key, self.get_region_bbox(region), width, height)
+        
+        dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)]
         successful = 0
         failed = 0
         
-        while current <= end:
-            date_str = current.strftime('%Y-%m-%d')
-            output_filename = f"{layer_key}_{region}_{date_str}.jpg"
-            output_path = os.path.join(output_dir, output_filename)
-            
-            print(f"Exporting {date_str}...")
-            
-            if self.export_region_image(layer_key, date_str, region, width, height, output_path, method):
-                successful += 1
-            else:
-                failed += 1
+        # Each day is an independent round trip; keep concurrency modest to stay polite to GIBS
+        max_workers = int(os.environ.get("GIBS_TIMESERIES_WORKERS", 8))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for date_str in dates:
+                output_filename = f"{layer_key}_{region}_{date_str}.jpg"
+                output_path = os.path.join(output_dir, output_filename)
+                
+                print(f"Exporting {date_str}...")
+                futures[executor.submit(
+                    self.export_region_image, layer_key, date_str, region, width, height, output_path, method, base_url
+                )] = date_str
             
-            current += timedelta(days=1)
+            for future in as_completed(futures):
+                try:
+                    success = future.result()
+                except Exception as e:
+                    print(f"Error exporting {futures[future]}: {e}")
+                    success = False
+                
+                if success:
+                    successful += 1
+                else:
+                    failed += 1
         
         print(f"Time series export complete: {successful} successful, {failed} failed")
         return successful, failed
@@ -282,29 +354,16 @@ class EarthdataImageExporter:
         lon_res = lon_span / width
         lat_res = lat_span / height
         
-        # WMTS zoom levels (approximate degrees per pixel)
-        zoom_resolutions = {
-            0: 1.40625,
-            1: 0.703125,
-            2: 0.3515625,
-            3: 0.17578125,
-            4: 0.087890625,
-            5: 0.0439453125
-        }
-        
+        # WMTS zoom levels halve the resolution each step from 1.40625 degrees per pixel at zoom 0,
+        # so the coarsest zoom at least as fine as the target is ceil(log2(1.40625 / target))
         target_res = max(lon_res, lat_res)
+        if target_res <= 0:
+            return 5  # Maximum zoom
         
-        for zoom, res in zoom_resolutions.items():
-            if res <= target_res:
-                return max(0, zoom - 1)
-        
-        return 5  # Maximum zoom
+        return max(0, min(5, math.ceil(math.log2(1.40625 / target_res))))
     
-    def get_tiles_for_bbox(self, bbox, zoom_level):
-        """Get tile coordinates for bounding box"""
-        # Convert bbox to tile coordinates
-        tiles = []
-        
+    def get_tile_range(self, bbox, zoom_level):
+        """Get the inclusive tile range (x_min, x_max, y_min, y_max) covering a bounding box"""
         # Simplified tile calculation (this would need proper implementation)
         max_tile = 2 ** zoom_level
         
@@ -313,37 +372,59 @@ class EarthdataImageExporter:
         y_min = max(0, int((90 - bbox[3]) / 180 * max_tile))
         y_max = min(max_tile - 1, int((90 - bbox[1]) / 180 * max_tile))
         
-        for x in range(x_min, x_max + 1):
-            for y in range(y_min, y_max + 1):
-                tiles.append((x, y))
+        return x_min, x_max, y_min, y_max
+    
+    def get_tiles_for_bbox(self, bbox, zoom_level):
+        """Get tile coordinates for bounding box"""
+        # Convert bbox to tile coordinates
+        x_min, x_max, y_min, y_max = self.get_tile_range(bbox, zoom_level)
         
-        return tiles
+        return list(product(range(x_min, x_max + 1), range(y_min, y_max + 1)))
     
     def stitch_tiles(self, tile_images, bbox, width, height, zoom_level):
         """Stitch downloaded tiles into final image"""
-        # Create output image
-        result = Image.new('RGB', (width, height), (0, 0, 50))
-        
-        # This is a simplified stitching - would need proper georeferencing
         tile_size = 256
-        cols = width // tile_size + 1
-        rows = height // tile_size + 1
-        
-        for i, (tile_x, tile_y, tile_img) in enumerate(tile_images):
-            x = (i % cols) * tile_size
-            y = (i // cols) * tile_size
-            
-            if x < width and y < height:
-                result.paste(tile_img, (x, y))
-        
-        return result.resize((width, height), Image.Resampling.LANCZOS)
+        world_size = (2 ** zoom_level) * tile_size
+        x_min, x_max, y_min, y_max = self.get_tile_range(bbox, zoom_level)
+        
+        # Mosaic covering exactly the tile range, each tile at its grid offset. It is left
+        # uninitialised and only the slots of missing tiles get the background colour
+        mosaic = Image.new('RGB', ((x_max - x_min + 1) * tile_size, (y_max - y_min + 1) * tile_size), None)
+        placed = set()
+        for tile_x, tile_y, tile_img in tile_images:
+            mosaic.paste(tile_img, ((tile_x - x_min) * tile_size, (tile_y - y_min) * tile_size))
+            placed.add((tile_x, tile_y))
+        
+        for tile_x, tile_y in self.get_tiles_for_bbox(bbox, zoom_level):
+            if (tile_x, tile_y) not in placed:
+                left = (tile_x - x_min) * tile_size
+                top = (tile_y - y_min) * tile_size
+                mosaic.paste((0, 0, 50), (left, top, left + tile_size, top + tile_size))
+        
+        # Crop to the bounding box using its fractional position inside the tile range
+        left = (bbox[0] + 180) / 360 * world_size - x_min * tile_size
+        right = (bbox[2] + 180) / 360 * world_size - x_min * tile_size
+        top = (90 - bbox[3]) / 180 * world_size - y_min * tile_size
+        bottom = (90 - bbox[1]) / 180 * world_size - y_min * tile_size
+        crop_box = (
+            max(0, round(left)),
+            max(0, round(top)),
+            min(mosaic.width, max(round(left) + 1, round(right))),
+            min(mosaic.height, max(round(top) + 1, round(bottom)))
+        )
+        result = mosaic.crop(crop_box)
+        
+        if result.size != (width, height):
+            # reducing_gap lets Pillow box-reduce large mosaics by an integer factor before the Lanczos pass
+            result = result.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        return result
     
     def list_available_layers(self):
         """List all available layers"""
         print("Available Layers:")
         print("================")
         for key, info in self.layers.items():
-            print(f"{key:20} | {info['name']}")
+            print(f"{key:20} | {info.name}")
         print()
 
 
@@ -359,11 +440,12 @@ def main():
     parser.add_argument("--bbox", help="Custom bounding box: min_lon,min_lat,max_lon,max_lat")
     parser.add_argument("--time-series", action="store_true", help="Export time series")
     parser.add_argument("--end-date", help="End date for time series (YYYY-MM-DD)")
+    parser.add_argument("--http2", action="store_true", help="Fetch WMTS tiles over a multiplexed HTTP/2 connection (requires httpx[http2])")
     parser.add_argument("--list-layers", action="store_true", help="List available layers")
     
     args = parser.parse_args()
     
-    exporter = EarthdataImageExporter()
+    exporter = EarthdataImageExporter(use_http2=args.http2)
     
     if args.list_layers:
         exporter.list_available_layers()
@@ -425,6 +507,4 @@ def main():
 
 
 if __name__ == "__main__":
-    import io
-    from io import BytesIO
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+GIBS Layer Table
+Shared layer metadata for the GIBS download and export scripts
+"""
+
+from typing import NamedTuple
+
+class LayerInfo(NamedTuple):
+    id: str
+    name: str
+    resolution: str
+    format: str
+
+# Available layers with their metadata
+LAYERS = {
+    "terra_true_color": LayerInfo(
+        id="MODIS_Terra_CorrectedReflectance_TrueColor",
+        name="Terra True Color",
+        resolution="250m",
+        format="jpg"
+    ),
+    "terra_false_color": LayerInfo(
+        id="MODIS_Terra_CorrectedReflectance_Bands367",
+        name="Terra False Color (3-6-7)",
+        resolution="250m",
+        format="jpg"
+    ),
+    "terra_bands721": LayerInfo(
+        id="MODIS_Terra_CorrectedReflectance_Bands721",
+        name="Terra Bands 7-2-1",
+        resolution="250m",
+        format="jpg"
+    ),
+    "terra_aerosol": LayerInfo(
+        id="MODIS_Terra_Aerosol",
+        name="Terra Aerosol Optical Depth",
+        resolution="1km",
+        format="png"
+    ),
+    "terra_lst": LayerInfo(
+        id="MODIS_Terra_Land_Surface_Temp_Day",
+        name="Terra Land Surface Temperature (Day)",
+        resolution="1km",
+        format="png"
+    ),
+    "terra_snow": LayerInfo(
+        id="MODIS_Terra_Snow_Cover",
+        name="Terra Snow Cover",
+        resolution="500m",
+        format="png"
+    ),
+    "aqua_true_color": LayerInfo(
+        id="MODIS_Aqua_CorrectedReflectance_TrueColor",
+        name="Aqua True Color",
+        resolution="250m",
+        format="jpg"
+    ),
+    "viirs_true_color": LayerInfo(
+        id="VIIRS_SNPP_CorrectedReflectance_TrueColor",
+        name="VIIRS True Color",
+        resolution="250m",
+        format="jpg"
+    )
+}
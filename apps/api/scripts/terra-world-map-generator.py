@@ -5,13 +5,54 @@ Combines Terra satellite tiles into world map visualizations
 """
 
 import os
+import re
 import sys
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-import glob
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import argparse
 
-def create_world_map_from_terra_tiles(images_dir, output_dir, date=None):
+# libjpeg-turbo codec (optional, falls back to Pillow)
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420
+    _tj = TurboJPEG()
+except Exception:  # Module missing or libturbojpeg not found
+    _tj = None
+
+# Resampling filters selectable with --resample
+RESAMPLE_FILTERS = {
+    'lanczos': Image.Resampling.LANCZOS,
+    'bicubic': Image.Resampling.BICUBIC,
+    'bilinear': Image.Resampling.BILINEAR
+}
+
+# Date in a tile filename, e.g. MODIS_Terra_CorrectedReflectance_TrueColor_2023-10-12_3_4_2.jpg
+DATE_RE = re.compile(r'_(\d{4}-\d{2}-\d{2})_')
+
+def _iter_tiles(images_dir):
+    """Yield (path, date) for the dated .jpg tiles in images_dir, in directory order"""
+    with os.scandir(images_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.jpg') and entry.is_file():
+                match = DATE_RE.search(entry.name)
+                if match:
+                    yield entry.path, match[1]
+
+def _dated_images(images_dir, start_date=None, end_date=None):
+    """
+    Return [(path, date)] sorted by path for the dated tiles in images_dir,
+    optionally limited to start_date <= date <= end_date
+    """
+    return sorted(
+        (img_path, img_date)
+        for img_path, img_date in _iter_tiles(images_dir)
+        if (start_date is None or start_date <= img_date)
+        and (end_date is None or img_date <= end_date)
+    )
+
+def create_world_map_from_terra_tiles(images_dir, output_dir, date=None, resample=Image.Resampling.LANCZOS, use_turbojpeg=False):
     """
     Create a world map visualization from Terra satellite tiles
     
@@ -19,202 +60,370 @@ def create_world_map_from_terra_tiles(images_dir, output_dir, date=None):
         images_dir: Directory containing Terra tile images
         output_dir: Directory to save world map outputs
         date: Specific date to process (YYYY-MM-DD) or None for all
+        resample: Pillow resampling filter used to scale the tile
+        use_turbojpeg: Encode outputs with libjpeg-turbo (requires PyTurboJPEG)
     """
     
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
     
-    # Find all Terra image files
-    if date:
-        pattern = f"*{date}*.jpg"
-    else:
-        pattern = "*.jpg"
-    
-    image_files = glob.glob(os.path.join(images_dir, pattern))
-    image_files.sort()
+    # Find the Terra image for each date (the first by name when a date has several)
+    tiles_by_date = {}
+    image_count = 0
+    for img_path, img_date in _iter_tiles(images_dir):
+        if date and img_date != date:
+            continue
+        image_count += 1
+        if img_date not in tiles_by_date or img_path < tiles_by_date[img_date]:
+            tiles_by_date[img_date] = img_path
     
-    if not image_files:
-        print(f"No images found matching pattern: {pattern}")
+    if not tiles_by_date:
+        print(f"No images found for date: {date}" if date else "No images found")
         return
     
-    print(f"Found {len(image_files)} Terra images")
-    
-    # Process images by date
-    dates_processed = set()
+    print(f"Found {image_count} Terra images")
     
-    for img_path in image_files:
-        try:
-            # Extract date from filename
-            filename = os.path.basename(img_path)
-            # Format: MODIS_Terra_CorrectedReflectance_TrueColor_2023-10-12_3_4_2.jpg
-            parts = filename.split('_')
-            img_date = parts[-3]  # Extract date part
-            
-            if img_date in dates_processed:
-                continue
+    # Process images by date; queued encodes are always waited for, even if a map fails hard
+    try:
+        for img_date, img_path in sorted(tiles_by_date.items()):
+            try:
+                # Create world map for this date
+                create_enhanced_world_map(img_path, output_dir, img_date, resample, use_turbojpeg=use_turbojpeg)
                 
-            dates_processed.add(img_date)
-            
-            # Create world map for this date
-            create_enhanced_world_map(img_path, output_dir, img_date)
-            
-        except Exception as e:
-            print(f"Error processing {img_path}: {e}")
-            continue
+            except Exception as e:
+                print(f"Error processing {img_path}: {e}")
+                continue
+    finally:
+        _wait_for_encodes()
+
+GRID_COLOR = (100, 100, 150)
+
+@lru_cache(maxsize=4)
+def _grid_lines(map_width, map_height):
+    """Pixel boxes (left, top, right, bottom) of the 1px longitude/latitude grid lines (cached)"""
+    # Vertical lines (longitude)
+    x_step = map_width // 6
+    lines = tuple(
+        (x_step * i, 120, x_step * i + 1, map_height - 99)
+        for i in range(6)
+    )
+    # Horizontal lines (latitude)
+    y_step = (map_height - 220) // 4
+    lines += tuple(
+        (50, 120 + y_step * i, map_width - 49, 120 + y_step * i + 1)
+        for i in range(4)
+    )
+    return lines
 
-def create_enhanced_world_map(tile_path, output_dir, date):
+# Grid of the default 1920x1080 canvas, folded once at import
+_grid_lines(1920, 1080)
+
+@lru_cache(maxsize=None)
+def _load_fonts():
+    """Load the title, subtitle and info fonts, falling back to the default font (cached)"""
+    # Try to load a font, fallback to default if not available
+    try:
+        title_font = ImageFont.truetype("arial.ttf", 36)
+        subtitle_font = ImageFont.truetype("arial.ttf", 24)
+        info_font = ImageFont.truetype("arial.ttf", 18)
+    except:
+        title_font = ImageFont.load_default()
+        subtitle_font = ImageFont.load_default()
+        info_font = ImageFont.load_default()
+    
+    return title_font, subtitle_font, info_font
+
+@lru_cache(maxsize=128)
+def _make_label(text, font, fg, shadow=(0, 0, 0), offset=(1, 1)):
     """
-    Create an enhanced world map visualization from a single Terra tile
+    Rasterize text once into a transparent RGBA label with its drop shadow (cached)
+    Returns (label, (dx, dy)); paste the label at (x + dx, y + dy) with itself as mask
+    """
+    left, top, right, bottom = font.getbbox(text)
+    size = (right - left + offset[0], bottom - top + offset[1])
+    
+    # Glyph coverage is rendered a single time and reused for the shadow and the text
+    mask = Image.new('L', (right - left, bottom - top), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+    
+    label = Image.new('RGBA', size, (0, 0, 0, 0))
+    for color, position in ((shadow, offset), (fg, (0, 0))):
+        layer = Image.new('RGBA', size, (0, 0, 0, 0))
+        layer.paste(color + (255,), (*position, position[0] + mask.width, position[1] + mask.height), mask)
+        label = Image.alpha_composite(label, layer)
+    
+    return label, (left, top)
+
+@lru_cache(maxsize=128)
+def _label_pixels(text, font, fg, offset=(1, 1)):
+    """A cached label split into uint32 (RGB, alpha) arrays for blending into a frame array"""
+    label, (dx, dy) = _make_label(text, font, fg, offset=offset)
+    pixels = np.asarray(label).astype(np.uint32)
+    return pixels[..., :3], pixels[..., 3:], (dx, dy)
+
+def _blend_label(frame, xy, text, font, fg, offset=(1, 1)):
+    """Alpha-blend a cached shadowed label into an (H, W, 3) uint8 frame, as Image.paste would"""
+    rgb, alpha, (dx, dy) = _label_pixels(text, font, fg, offset)
+    x, y = xy[0] + dx, xy[1] + dy
+    region = frame[y:y + alpha.shape[0], x:x + alpha.shape[1]]
+    # Same rounded division by 255 as Pillow's paste with a mask
+    blended = region * (255 - alpha) + rgb * alpha + 128
+    region[...] = (blended + (blended >> 8)) >> 8
+
+@lru_cache(maxsize=4)
+def _build_static_background(map_width=1920, map_height=1080):
+    """
+    Render the frame-independent background of the world map (canvas and grid)
+    once per canvas size, so each map only copies it. Text and border are drawn
+    per map after the tile, so they stay on top of it (see _static_labels).
+    Returns (background, grid_lines); grid_lines are the pixel boxes of the
+    grid so they can be restored on top of the pasted tile. The background is
+    shared (cached) and must not be modified
+    """
+    # Create base world map canvas
+    background = Image.new('RGB', (map_width, map_height), color=(25, 25, 112))  # Navy blue
+    
+    # Add geographic grid lines for context, as 1px boxes filled directly
+    grid_lines = _grid_lines(map_width, map_height)
+    for box in grid_lines:
+        background.paste(GRID_COLOR, box)
+    
+    return background, grid_lines
+
+@lru_cache(maxsize=4)
+def _static_labels(map_width=1920, map_height=1080):
+    """
+    Title and info footer of the world map as (xy, text, font, fg, offset) label
+    arguments, split into the labels above and below the grid (cached)
+    """
+    title_font, _, info_font = _load_fonts()
+    
+    # Add title, centered
+    title = f"NASA Terra Satellite - World View"
+    title_bbox = title_font.getbbox(title)
+    title_width = title_bbox[2] - title_bbox[0]
+    title_x = (map_width - title_width) // 2
+    header = (((title_x, 30), title, title_font, (255, 255, 255), (2, 2)),)
+    
+    # Add coordinate information
+    coord_info = "Tile Coordinates: Z:3, X:4, Y:2 (Global Coverage)"
+    layer_info = "Layer: MODIS Terra Corrected Reflectance (True Color)"
+    resolution_info = "Resolution: 250m per pixel"
+    
+    info_y = map_height - 90
+    footer = (
+        ((50, info_y), coord_info, info_font, (255, 255, 255), (1, 1)),
+        ((50, info_y + 25), layer_info, info_font, (200, 255, 200), (1, 1)),
+        ((50, info_y + 50), resolution_info, info_font, (200, 200, 255), (1, 1)),
+    )
+    return header, footer
+
+@lru_cache(maxsize=4)
+def _background_pixels(map_width, map_height):
+    """The static background as an (H, W, 3) uint8 array (cached, copy before modifying)"""
+    background, _ = _build_static_background(map_width, map_height)
+    return np.asarray(background)
+
+@lru_cache(maxsize=16)
+def _tile_layout(map_width, map_height, tile_width, tile_height):
+    """
+    Placement of a tile_width x tile_height tile on the map (cached)
+    Returns ((scaled_width, scaled_height), (tile_x, tile_y), grid boxes clipped to the tile)
+    """
+    _, grid_lines = _build_static_background(map_width, map_height)
+    
+    # Scale the Terra tile to fit nicely in the world map
+    tile_scale = 0.6
+    scaled_width = int(tile_width * tile_scale)
+    scaled_height = int(tile_height * tile_scale)
+    
+    # Position the tile in the center-right area (representing its geographic location)
+    tile_x = map_width // 2 - scaled_width // 2
+    tile_y = map_height // 2 - scaled_height // 2
+    
+    # Grid lines crossing the tile, to be restored on top of it
+    tile_grid = []
+    for left, top, right, bottom in grid_lines:
+        box = (max(left, tile_x), max(top, tile_y),
+               min(right, tile_x + scaled_width), min(bottom, tile_y + scaled_height))
+        if box[0] < box[2] and box[1] < box[3]:
+            tile_grid.append(box)
+    
+    return (scaled_width, scaled_height), (tile_x, tile_y), tile_grid
+
+# JPEG encodes run on these threads (libjpeg releases the GIL) while the next map renders
+_encode_pool = ThreadPoolExecutor(max_workers=2)
+_pending_encodes = []
+
+def _save_jpeg(image, path, quality, date, message, use_turbojpeg=False):
+    """
+    Encode one map or thumbnail (PIL image, or RGB array on the libjpeg-turbo path),
+    reporting the outcome like create_enhanced_world_map
     """
     try:
-        # Load the Terra satellite image
-        terra_img = Image.open(tile_path)
-        original_width, original_height = terra_img.size
-        
-        # Create a larger canvas for world map context
-        map_width = 1920
-        map_height = 1080
-        
-        # Create base world map canvas
-        world_map = Image.new('RGB', (map_width, map_height), color=(25, 25, 112))  # Navy blue
-        
-        # Calculate tile positioning for global context
-        # The tile coordinates (3, 4, 2) represent a specific geographic region
-        # Let's position it appropriately on the world map
+        if use_turbojpeg:
+            data = _tj.encode(np.asarray(image), quality=quality,
+                              pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420)
+            with open(path, 'wb') as f:
+                f.write(data)
+        else:
+            image.save(path, "JPEG", quality=quality, optimize=False, progressive=False, subsampling=2)
+        print(message)
+    except Exception as e:
+        print(f"❌ Error creating world map for {date}: {e}")
+
+def _wait_for_encodes(limit=0):
+    """Block until at most limit queued encodes are still pending"""
+    while len(_pending_encodes) > limit:
+        _pending_encodes.pop(0).result()
+
+def _decode_tile(tile_path, map_width, map_height):
+    """
+    Decode a tile at the largest 1/2, 1/4 or 1/8 scale that still covers its size on the map
+    Returns (tile image, tile layout from _tile_layout)
+    """
+    if _tj is not None:
+        with open(tile_path, 'rb') as f:
+            jpeg = f.read()
+        original_width, original_height = _tj.decode_header(jpeg)[:2]
+        layout = _tile_layout(map_width, map_height, original_width, original_height)
         
-        # Scale the Terra tile to fit nicely in the world map
-        tile_scale = 0.6
-        scaled_width = int(original_width * tile_scale)
-        scaled_height = int(original_height * tile_scale)
-        terra_scaled = terra_img.resize((scaled_width, scaled_height), Image.Resampling.LANCZOS)
+        # Same scale choice as Image.draft()
+        scaled_width, scaled_height = layout[0]
+        scale = min(original_width // scaled_width, original_height // scaled_height)
+        reduction = next(a for a in (8, 4, 2, 1) if scale >= a)
+        pixels = _tj.decode(jpeg, pixel_format=TJPF_RGB, scaling_factor=(1, reduction))
+        return Image.fromarray(pixels, 'RGB'), layout
+    
+    # Size comes from the header, nothing is decoded until the resize
+    terra_img = Image.open(tile_path)
+    layout = _tile_layout(map_width, map_height, *terra_img.size)
+    terra_img.draft('RGB', layout[0])
+    return terra_img, layout
+
+def create_enhanced_world_map(tile_path, output_dir, date, resample=Image.Resampling.LANCZOS, map_size=(1920, 1080), use_turbojpeg=False):
+    """
+    Create an enhanced world map visualization from a single Terra tile
+    use_turbojpeg: encode the map and thumbnail with libjpeg-turbo
+    """
+    try:
+        map_width, map_height = map_size
+        use_turbojpeg = use_turbojpeg and _tj is not None
         
-        # Position the tile in the center-right area (representing its geographic location)
-        tile_x = map_width // 2 - scaled_width // 2
-        tile_y = map_height // 2 - scaled_height // 2
+        # Load the Terra satellite image with the scaled size and position of the tile for global
+        # context; the tile coordinates (3, 4, 2) represent a specific geographic region
+        terra_img, (scaled_size, tile_position, tile_grid) = _decode_tile(tile_path, map_width, map_height)
+        # Whatever the decoder could not drop by 1/2 steps goes through a box reduce() first
+        terra_scaled = terra_img.resize(scaled_size, resample, reducing_gap=3.0)
+        if terra_scaled.mode != 'RGB':
+            terra_scaled = terra_scaled.convert('RGB')
         
-        # Paste the Terra tile onto the world map
-        world_map.paste(terra_scaled, (tile_x, tile_y))
+        # Compose the frame as a pixel array: start from the pre-rendered canvas and grid, copy the
+        # Terra tile in, then restore the grid lines crossing it and draw the text and border on top
+        frame = _background_pixels(map_width, map_height).copy()
+        tile_x, tile_y = tile_position
         
-        # Add geographic context visualization
-        draw = ImageDraw.Draw(world_map)
+        # Only the part of the tile that lands on the canvas is copied (clipped like Image.paste)
+        dst_x0, dst_y0 = max(tile_x, 0), max(tile_y, 0)
+        dst_x1 = min(tile_x + scaled_size[0], map_width)
+        dst_y1 = min(tile_y + scaled_size[1], map_height)
+        frame[dst_y0:dst_y1, dst_x0:dst_x1] = np.asarray(terra_scaled)[
+            dst_y0 - tile_y:dst_y1 - tile_y, dst_x0 - tile_x:dst_x1 - tile_x]
+        for left, top, right, bottom in tile_grid:
+            frame[top:bottom, left:right] = GRID_COLOR
         
-        # Try to load a font, fallback to default if not available
-        try:
-            title_font = ImageFont.truetype("arial.ttf", 36)
-            subtitle_font = ImageFont.truetype("arial.ttf", 24)
-            info_font = ImageFont.truetype("arial.ttf", 18)
-        except:
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-            info_font = ImageFont.load_default()
+        # Add the title, the per-date subtitle and the info footer (cached label bitmaps)
+        header, footer = _static_labels(map_width, map_height)
+        for xy, text, font, fg, offset in header:
+            _blend_label(frame, xy, text, font, fg, offset)
         
-        # Add title and information
-        title = f"NASA Terra Satellite - World View"
+        _, subtitle_font, _ = _load_fonts()
         subtitle = f"Date: {date}"
         
-        # Calculate text positions
-        title_bbox = draw.textbbox((0, 0), title, font=title_font)
-        title_width = title_bbox[2] - title_bbox[0]
-        title_x = (map_width - title_width) // 2
-        
-        subtitle_bbox = draw.textbbox((0, 0), subtitle, font=subtitle_font)
+        subtitle_bbox = subtitle_font.getbbox(subtitle)
         subtitle_width = subtitle_bbox[2] - subtitle_bbox[0]
         subtitle_x = (map_width - subtitle_width) // 2
         
-        # Draw title with shadow effect
-        draw.text((title_x + 2, 32), title, font=title_font, fill=(0, 0, 0))
-        draw.text((title_x, 30), title, font=title_font, fill=(255, 255, 255))
-        
         # Draw subtitle
-        draw.text((subtitle_x + 1, 81), subtitle, font=subtitle_font, fill=(0, 0, 0))
-        draw.text((subtitle_x, 80), subtitle, font=subtitle_font, fill=(200, 200, 255))
-        
-        # Add geographic grid lines for context
-        grid_color = (100, 100, 150, 128)
-        
-        # Vertical lines (longitude)
-        for i in range(6):
-            x = (map_width // 6) * i
-            draw.line([(x, 120), (x, map_height - 100)], fill=grid_color, width=1)
-        
-        # Horizontal lines (latitude)
-        for i in range(4):
-            y = 120 + ((map_height - 220) // 4) * i
-            draw.line([(50, y), (map_width - 50, y)], fill=grid_color, width=1)
-        
-        # Add coordinate information
-        coord_info = "Tile Coordinates: Z:3, X:4, Y:2 (Global Coverage)"
-        layer_info = "Layer: MODIS Terra Corrected Reflectance (True Color)"
-        resolution_info = "Resolution: 250m per pixel"
+        _blend_label(frame, (subtitle_x, 80), subtitle, subtitle_font, (200, 200, 255))
         
-        info_y = map_height - 90
-        draw.text((51, info_y + 1), coord_info, font=info_font, fill=(0, 0, 0))
-        draw.text((50, info_y), coord_info, font=info_font, fill=(255, 255, 255))
+        for xy, text, font, fg, offset in footer:
+            _blend_label(frame, xy, text, font, fg, offset)
         
-        info_y += 25
-        draw.text((51, info_y + 1), layer_info, font=info_font, fill=(0, 0, 0))
-        draw.text((50, info_y), layer_info, font=info_font, fill=(200, 255, 200))
-        
-        info_y += 25
-        draw.text((51, info_y + 1), resolution_info, font=info_font, fill=(0, 0, 0))
-        draw.text((50, info_y), resolution_info, font=info_font, fill=(200, 200, 255))
-        
-        # Add border frame
-        border_color = (255, 255, 255)
+        # Add border frame (3px, white)
         border_width = 3
-        draw.rectangle([0, 0, map_width-1, map_height-1], outline=border_color, width=border_width)
+        frame[:border_width] = frame[-border_width:] = 255
+        frame[:, :border_width] = frame[:, -border_width:] = 255
+        world_map = Image.fromarray(frame, 'RGB')
         
-        # Save the enhanced world map
+        # Also create a thumbnail version (from a copy, the full-size map is encoded concurrently)
+        thumbnail_size = (800, 450)
+        thumbnail = world_map.copy()
+        thumbnail.thumbnail(thumbnail_size, resample)
+        
+        # Save both in the background; keep at most two earlier maps in flight to bound memory
         output_filename = f"terra_world_map_{date}.jpg"
         output_path = os.path.join(output_dir, output_filename)
-        world_map.save(output_path, "JPEG", quality=95)
-        
-        print(f"✅ Created world map: {output_filename}")
-        
-        # Also create a thumbnail version
-        thumbnail_size = (800, 450)
-        thumbnail = world_map.resize(thumbnail_size, Image.Resampling.LANCZOS)
         thumb_filename = f"terra_world_map_{date}_thumb.jpg"
         thumb_path = os.path.join(output_dir, thumb_filename)
-        thumbnail.save(thumb_path, "JPEG", quality=85)
         
-        print(f"📎 Created thumbnail: {thumb_filename}")
+        _wait_for_encodes(limit=4)
+        _pending_encodes.append(_encode_pool.submit(
+            _save_jpeg, frame if use_turbojpeg else world_map, output_path, 95, date,
+            f"✅ Created world map: {output_filename}", use_turbojpeg))
+        _pending_encodes.append(_encode_pool.submit(
+            _save_jpeg, thumbnail, thumb_path, 80, date,
+            f"📎 Created thumbnail: {thumb_filename}", use_turbojpeg))
         
     except Exception as e:
         print(f"❌ Error creating world map for {date}: {e}")
 
-def create_animation_frames(images_dir, output_dir, start_date=None, end_date=None):
+def _init_frame_worker():
+    """ProcessPoolExecutor initializer: render the (cached) static background and labels once per worker"""
+    _build_static_background()
+    _static_labels()
+
+def _render_frame(img_path, anim_dir, label, resample, use_turbojpeg=False):
+    """
+    Render one animation frame in a worker process; returns once its map and thumbnail are
+    written, so a finished task never leaves encodes to the worker's exit. Other workers keep
+    the CPUs busy meanwhile
+    """
+    create_enhanced_world_map(img_path, anim_dir, label, resample, use_turbojpeg=use_turbojpeg)
+    _wait_for_encodes()
+
+def create_animation_frames(images_dir, output_dir, start_date=None, end_date=None, resample=Image.Resampling.LANCZOS, jobs=None, use_turbojpeg=False):
     """
     Create animation frames from a sequence of Terra images
+    jobs: number of frame worker processes (default: one per CPU)
+    use_turbojpeg: encode frames with libjpeg-turbo
     """
     print("🎬 Creating animation frames...")
     
     # Find all image files in date range
-    image_files = glob.glob(os.path.join(images_dir, "*.jpg"))
-    image_files.sort()
-    
     if start_date and end_date:
-        filtered_files = []
-        for img_path in image_files:
-            filename = os.path.basename(img_path)
-            parts = filename.split('_')
-            img_date = parts[-3]
-            if start_date <= img_date <= end_date:
-                filtered_files.append(img_path)
-        image_files = filtered_files
+        dated_images = _dated_images(images_dir, start_date, end_date)
+    else:
+        dated_images = _dated_images(images_dir)
     
-    print(f"Creating animation from {len(image_files)} frames...")
+    print(f"Creating animation from {len(dated_images)} frames...")
     
     # Create animation directory
     anim_dir = os.path.join(output_dir, "animation_frames")
     os.makedirs(anim_dir, exist_ok=True)
     
-    for i, img_path in enumerate(image_files[:30]):  # Limit to first 30 for demo
-        filename = os.path.basename(img_path)
-        parts = filename.split('_')
-        img_date = parts[-3]
-        
-        create_enhanced_world_map(img_path, anim_dir, f"{img_date}_frame_{i:03d}")
+    frame_paths = []
+    frame_labels = []
+    for i, (img_path, img_date) in enumerate(dated_images[:30]):  # Limit to first 30 for demo
+        frame_paths.append(img_path)
+        frame_labels.append(f"{img_date}_frame_{i:03d}")
+    
+    # Frames are independent and CPU-bound (decode, resize, JPEG encode), so render them in
+    # separate processes; each worker renders the static background once at startup
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_frame_worker) as executor:
+        list(executor.map(_render_frame, frame_paths, [anim_dir] * len(frame_paths),
+                          frame_labels, [resample] * len(frame_paths),
+                          [use_turbojpeg] * len(frame_paths)))
 
 def main():
     parser = argparse.ArgumentParser(description="Generate world maps from Terra satellite images")
@@ -224,8 +433,12 @@ def main():
     parser.add_argument("--animation", "-a", action="store_true", help="Create animation frames")
     parser.add_argument("--start-date", help="Start date for animation (YYYY-MM-DD)")
     parser.add_argument("--end-date", help="End date for animation (YYYY-MM-DD)")
+    parser.add_argument("--resample", choices=list(RESAMPLE_FILTERS), default='lanczos', help="Resampling filter for scaling tiles")
+    parser.add_argument("--jobs", "-j", type=int, help="Worker processes for animation frames (default: CPU count)")
+    parser.add_argument("--turbojpeg", action="store_true", help="Encode output JPEGs with libjpeg-turbo (requires PyTurboJPEG)")
     
     args = parser.parse_args()
+    resample = RESAMPLE_FILTERS[args.resample]
     
     if not os.path.exists(args.input):
         print(f"❌ Input directory does not exist: {args.input}")
@@ -236,9 +449,9 @@ def main():
     print(f"💾 Output: {args.output}")
     
     if args.animation:
-        create_animation_frames(args.input, args.output, args.start_date, args.end_date)
+        create_animation_frames(args.input, args.output, args.start_date, args.end_date, resample, args.jobs, args.turbojpeg)
     else:
-        create_world_map_from_terra_tiles(args.input, args.output, args.date)
+        create_world_map_from_terra_tiles(args.input, args.output, args.date, resample, args.turbojpeg)
     
     print("✅ World map generation complete!")
     return 0
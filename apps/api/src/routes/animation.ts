@@ -477,6 +477,67 @@ router.get('/jobs', (req, res) => {
   }
 });
 
+/**
+ * GET /api/animation/:jobId/events
+ * Stream animation status changes as Server-Sent Events
+ */
+router.get('/:jobId/events', (req, res) => {
+  const { jobId } = req.params;
+
+  if (!animationJobs.has(jobId)) {
+    return res.status(404).json({
+      error: 'Job not found',
+      message: 'Animation job not found or expired'
+    });
+  }
+
+  res.setHeader('Content-Type', 'text/event-stream');
+  res.setHeader('Cache-Control', 'no-cache');
+  res.setHeader('Connection', 'keep-alive');
+  res.flushHeaders();
+
+  // Only send an event when the status or progress actually changes
+  let lastPayload = '';
+  const sendUpdate = (): boolean => {
+    const job = animationJobs.get(jobId);
+    if (!job) {
+      res.end();
+      return false;
+    }
+
+    const completedFrames = job.frames.filter(f => f.status === 'completed').length;
+    const progress = job.frames.length > 0 ? (completedFrames / job.frames.length) * 100 : 0;
+    const payload = JSON.stringify({
+      status: job.status,
+      progress: Math.round(progress),
+      totalFrames: job.frames.length,
+      completedFrames
+    });
+
+    if (payload !== lastPayload) {
+      res.write(`data: ${payload}\n\n`);
+      lastPayload = payload;
+    }
+
+    if (job.status !== 'processing') {
+      res.end();
+      return false;
+    }
+    return true;
+  };
+
+  if (!sendUpdate()) {
+    return;
+  }
+
+  const timer = setInterval(() => {
+    if (!sendUpdate()) {
+      clearInterval(timer);
+    }
+  }, 500);
+  req.on('close', () => clearInterval(timer));
+});
+
 // Helper functions
 
 function generateJobId(): string {
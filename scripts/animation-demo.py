@@ -5,15 +5,38 @@ Complete demonstration of time-lapse satellite animation capabilities
 """
 
 import os
-import json
+import shutil
 import requests
+from requests.adapters import HTTPAdapter
 import time
 from datetime import datetime, timedelta
 
+# Fast JSON codec (optional, falls back to the stdlib)
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    import json
+    json_loads = json.loads
+    
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+
 class Terra25AnimationDemo:
     def __init__(self, api_base="http://localhost:3005"):
         self.api_base = api_base
         self.session = requests.Session()
+        # One keep-alive pool shared by every call of the demo
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+    def _post_json(self, path, payload):
+        """POST a JSON payload serialized up front, so requests does not re-encode it"""
+        return self.session.post(
+            f"{self.api_base}{path}",
+            data=json_dumps(payload),
+            headers={"Content-Type": "application/json"}
+        )
         
     def create_animation(self, layer, start_date, end_date, bbox=None):
         """Create a new animation job"""
@@ -31,46 +54,80 @@ class Terra25AnimationDemo:
         print(f"📅 Date range: {start_date} to {end_date}")
         print(f"🌍 Coverage: {bbox}")
         
-        response = self.session.post(
-            f"{self.api_base}/api/animation/generate",
-            json=payload
-        )
+        response = self._post_json("/api/animation/generate", payload)
         
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
             print(f"✅ Animation job created: {data['jobId']}")
             return data['jobId']
         else:
             print(f"❌ Failed to create animation: {response.status_code}")
             return None
     
+    def _report_status(self, data):
+        """Print a status update, returns True/False once the job has finished, else None"""
+        status = data.get('status', 'unknown')
+        progress = data.get('progress', 0)
+        
+        print(f"📊 Status: {status} | Progress: {progress:.1f}%")
+        
+        if status == 'completed':
+            print(f"🎉 Animation generation completed!")
+            return True
+        elif status == 'failed':
+            print(f"💥 Animation generation failed: {data.get('error', 'Unknown error')}")
+            return False
+        return None
+    
     def monitor_progress(self, job_id, max_wait=300):
         """Monitor animation generation progress"""
         print(f"⏳ Monitoring progress for job: {job_id}")
         start_time = time.time()
         
+        # Poll with exponential backoff (1, 2, 4, 8, 15 s), starting over whenever the job moves
+        attempt = 0
+        last_state = None
         while time.time() - start_time < max_wait:
-            response = self.session.get(f"{self.api_base}/api/animation/{job_id}")
+            response = self.session.get(f"{self.api_base}/api/animation/status/{job_id}", timeout=(3.05, 30))
             
             if response.status_code == 200:
-                data = response.json()
-                status = data.get('status', 'unknown')
-                progress = data.get('progress', 0)
-                
-                print(f"📊 Status: {status} | Progress: {progress:.1f}%")
+                data = json_loads(response.content).get('job', {})
+                result = self._report_status(data)
+                if result is not None:
+                    return result
                 
-                if status == 'completed':
-                    print(f"🎉 Animation generation completed!")
-                    return True
-                elif status == 'failed':
-                    print(f"💥 Animation generation failed: {data.get('error', 'Unknown error')}")
-                    return False
+                state = (data.get('status'), data.get('progress'))
+                if state != last_state:
+                    attempt = 0
+                    last_state = state
                     
-            time.sleep(5)  # Check every 5 seconds
+            time.sleep(min(15, 2 ** attempt))
+            attempt += 1
             
         print("⏰ Timeout waiting for animation completion")
         return False
     
+    def monitor_progress_stream(self, job_id, max_wait=300):
+        """Monitor progress from the job's Server-Sent Events stream, falling back to polling"""
+        print(f"⏳ Streaming progress for job: {job_id}")
+        
+        try:
+            with self.session.get(
+                f"{self.api_base}/api/animation/{job_id}/events",
+                stream=True,
+                timeout=(3.05, max_wait)
+            ) as response:
+                if response.status_code == 200:
+                    for line in response.iter_lines():
+                        if line and line.startswith(b'data:'):
+                            result = self._report_status(json_loads(line[5:]))
+                            if result is not None:
+                                return result
+        except requests.RequestException as e:
+            print(f"⚠️  Event stream unavailable: {e}")
+        
+        return self.monitor_progress(job_id, max_wait)
+    
     def export_video(self, job_id, format="mp4", fps=2, quality="medium"):
         """Export animation as video"""
         payload = {
@@ -82,13 +139,10 @@ class Terra25AnimationDemo:
         
         print(f"🎥 Exporting video: {format.upper()}")
         
-        response = self.session.post(
-            f"{self.api_base}/api/animation/export-video/{job_id}",
-            json=payload
-        )
+        response = self._post_json(f"/api/animation/export-video/{job_id}", payload)
         
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
             export_id = data['exportId']
             print(f"✅ Video export started: {export_id}")
             return export_id
@@ -100,20 +154,21 @@ class Terra25AnimationDemo:
         """Download animation frames as ZIP"""
         print(f"📦 Downloading frames archive...")
         
-        response = self.session.get(
+        # The ZIP is already compressed, so ask for it as-is
+        with self.session.get(
             f"{self.api_base}/api/animation/download-frames/{job_id}",
+            headers={"Accept-Encoding": "identity"},
             stream=True
-        )
-        
-        if response.status_code == 200:
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print(f"✅ Frames downloaded: {output_path}")
-            return True
-        else:
-            print(f"❌ Failed to download frames: {response.status_code}")
-            return False
+        ) as response:
+            if response.status_code == 200:
+                response.raw.decode_content = True
+                with open(output_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, 1024 * 1024)
+                print(f"✅ Frames downloaded: {output_path}")
+                return True
+            else:
+                print(f"❌ Failed to download frames: {response.status_code}")
+                return False
 
 def main():
     """Main demonstration function"""
@@ -133,7 +188,7 @@ def main():
         return
     
     # 2. Monitor progress
-    if not demo.monitor_progress(job_id):
+    if not demo.monitor_progress_stream(job_id):
         return
     
     # 3. Export video
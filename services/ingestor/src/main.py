@@ -5,14 +5,14 @@ Main application for processing NASA Terra satellite data
 
 import os
 import asyncio
+import functools
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from pathlib import Path
 
-import schedule
-import time
 from dotenv import load_dotenv
 
 from downloaders.nasa_downloader import NASADownloader
@@ -30,6 +30,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Shared worker processes for CPU-bound image processing, outside the event loop's GIL
+_process_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+
 @dataclass
 class IngestionJob:
     """Represents a data ingestion job"""
@@ -53,83 +56,172 @@ class TerraIngestor:
         self.data_dir = Path(os.getenv('DATA_DIR', '/app/data'))
         self.output_dir = Path(os.getenv('OUTPUT_DIR', '/app/output'))
         
-        # Create directories
-        self.data_dir.mkdir(exist_ok=True)
-        self.output_dir.mkdir(exist_ok=True)
+        # Create directories (DATA_DIR may point below a tmpfs such as /dev/shm)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
         
         logger.info("🚀 Terra25 Ingestor initialized")
     
     async def process_job(self, job: IngestionJob) -> Dict[str, Any]:
         """Process a single ingestion job"""
-        try:
-            logger.info(f"📥 Processing job: {job.product} for {job.date}")
-            
-            # Step 1: Download raw data from NASA
-            raw_file = await self.downloader.download(
-                product=job.product,
-                date=job.date,
-                bbox=job.bbox,
-                output_dir=self.data_dir
-            )
-            
-            if not raw_file:
-                raise Exception("Failed to download data from NASA")
-            
-            logger.info(f"✅ Downloaded: {raw_file}")
-            
-            # Step 2: Process the data (reproject, tile, etc.)
-            processed_files = await self.processor.process(
-                input_file=raw_file,
-                bbox=job.bbox,
-                resolution=job.resolution,
-                format=job.format,
-                output_dir=self.output_dir
-            )
-            
-            logger.info(f"✅ Processed {len(processed_files)} files")
-            
-            # Step 3: Upload to cloud storage
-            uploaded_urls = []
-            for file_path in processed_files:
-                url = await self.uploader.upload(file_path)
-                uploaded_urls.append(url)
-                logger.info(f"☁️  Uploaded: {url}")
-            
-            # Step 4: Store metadata in database
-            metadata = {
-                'product': job.product,
-                'date': job.date,
-                'bbox': job.bbox,
-                'resolution': job.resolution,
-                'format': job.format,
-                'files': uploaded_urls,
-                'processed_at': datetime.utcnow().isoformat(),
-                'file_count': len(uploaded_urls)
-            }
-            
-            await self.metadata_store.store(metadata)
-            logger.info(f"💾 Stored metadata for {job.product}")
-            
-            # Cleanup local files
-            self._cleanup_files([raw_file] + processed_files)
-            
-            return {
-                'status': 'success',
-                'product': job.product,
-                'date': job.date,
-                'files_processed': len(processed_files),
-                'urls': uploaded_urls,
-                'metadata': metadata
-            }
-            
-        except Exception as e:
-            logger.error(f"❌ Job failed: {str(e)}")
-            return {
+        results = await self.process_jobs([job])
+        return results[0]
+    
+    async def process_jobs(self, jobs: List[IngestionJob]) -> List[Dict[str, Any]]:
+        """
+        Process jobs through a download -> process -> upload pipeline.
+        Each stage runs its own workers connected by bounded queues, so one
+        job can be uploading while the next is processed and a third downloads.
+        """
+        concurrency = max(1, min(os.cpu_count() or 1, len(jobs)))
+        pending: asyncio.Queue = asyncio.Queue()
+        downloaded: asyncio.Queue = asyncio.Queue(maxsize=4)
+        processed: asyncio.Queue = asyncio.Queue(maxsize=4)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+        # Caps parallel S3 PUTs across all jobs to avoid throttling
+        upload_slots = asyncio.Semaphore(16)
+        
+        def fail(index: int, job: IngestionJob, error: Exception):
+            logger.error(f"❌ Job failed: {str(error)}")
+            results[index] = {
                 'status': 'error',
                 'product': job.product,
                 'date': job.date,
-                'error': str(e)
+                'error': str(error)
             }
+        
+        async def downloader_worker():
+            while True:
+                index, job = await pending.get()
+                try:
+                    logger.info(f"📥 Processing job: {job.product} for {job.date}")
+                    
+                    # Step 1: Download raw data from NASA
+                    raw_file = await self.downloader.download(
+                        product=job.product,
+                        date=job.date,
+                        bbox=job.bbox,
+                        output_dir=self.data_dir
+                    )
+                    
+                    if not raw_file:
+                        raise Exception("Failed to download data from NASA")
+                    
+                    logger.info(f"✅ Downloaded: {raw_file}")
+                    await downloaded.put((index, job, raw_file))
+                except Exception as e:
+                    fail(index, job, e)
+                finally:
+                    pending.task_done()
+        
+        async def processor_worker():
+            while True:
+                index, job, raw_file = await downloaded.get()
+                try:
+                    # Step 2: Process the data (reproject, tile, etc.)
+                    processed_files = await self._process(job, raw_file)
+                    
+                    logger.info(f"✅ Processed {len(processed_files)} files")
+                    await processed.put((index, job, raw_file, processed_files))
+                except Exception as e:
+                    fail(index, job, e)
+                finally:
+                    downloaded.task_done()
+        
+        async def uploader_worker():
+            while True:
+                index, job, raw_file, processed_files = await processed.get()
+                try:
+                    results[index] = await self._upload_and_record(job, raw_file, processed_files, upload_slots)
+                except Exception as e:
+                    fail(index, job, e)
+                finally:
+                    processed.task_done()
+        
+        workers = [
+            asyncio.create_task(worker())
+            for worker in (downloader_worker, processor_worker, uploader_worker)
+            for _ in range(concurrency)
+        ]
+        
+        for index, job in enumerate(jobs):
+            pending.put_nowait((index, job))
+        
+        try:
+            # Every item is handed to the next queue before task_done(), so draining in stage order is enough
+            await pending.join()
+            await downloaded.join()
+            await processed.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        
+        return results
+    
+    async def _process(self, job: IngestionJob, raw_file: Path) -> List[Path]:
+        """
+        Process a downloaded file. A processor with a synchronous process_sync()
+        runs in the shared process pool, otherwise its async process() is awaited.
+        """
+        kwargs = dict(
+            input_file=raw_file,
+            bbox=job.bbox,
+            resolution=job.resolution,
+            format=job.format,
+            output_dir=self.output_dir
+        )
+        
+        process_sync = getattr(self.processor, 'process_sync', None)
+        if process_sync is None:
+            return await self.processor.process(**kwargs)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_process_pool, functools.partial(process_sync, **kwargs))
+    
+    async def _upload_and_record(
+        self,
+        job: IngestionJob,
+        raw_file: Path,
+        processed_files: List[Path],
+        upload_slots: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """Upload the processed files of a job and store its metadata"""
+        # Step 3: Upload to cloud storage, files in parallel (URLs keep the file order)
+        async def upload(file_path: Path) -> str:
+            async with upload_slots:
+                url = await self.uploader.upload(file_path)
+            logger.info(f"☁️  Uploaded: {url}")
+            return url
+        
+        uploaded_urls = list(await asyncio.gather(*[upload(file_path) for file_path in processed_files]))
+        
+        # Step 4: Store metadata in database
+        metadata = {
+            'product': job.product,
+            'date': job.date,
+            'bbox': job.bbox,
+            'resolution': job.resolution,
+            'format': job.format,
+            'files': uploaded_urls,
+            'processed_at': datetime.utcnow().isoformat(),
+            'file_count': len(uploaded_urls)
+        }
+        
+        await self.metadata_store.store(metadata)
+        logger.info(f"💾 Stored metadata for {job.product}")
+        
+        # Cleanup local files
+        self._cleanup_files([raw_file] + processed_files)
+        
+        return {
+            'status': 'success',
+            'product': job.product,
+            'date': job.date,
+            'files_processed': len(processed_files),
+            'urls': uploaded_urls,
+            'metadata': metadata
+        }
     
     async def process_date_range(
         self, 
@@ -157,32 +249,20 @@ class TerraIngestor:
         
         logger.info(f"📋 Processing {len(jobs)} jobs for {product}")
         
-        # Process jobs concurrently (but limit concurrency)
-        semaphore = asyncio.Semaphore(3)  # Max 3 concurrent jobs
-        
-        async def process_with_semaphore(job):
-            async with semaphore:
-                return await self.process_job(job)
-        
-        results = await asyncio.gather(
-            *[process_with_semaphore(job) for job in jobs],
-            return_exceptions=True
-        )
-        
-        return results
+        # Stream the jobs through the download/process/upload pipeline
+        return await self.process_jobs(jobs)
     
     def _cleanup_files(self, file_paths: List[Path]):
         """Clean up temporary files"""
         for file_path in file_paths:
             try:
-                if file_path.exists():
-                    file_path.unlink()
-                    logger.debug(f"🗑️  Cleaned up: {file_path}")
+                file_path.unlink(missing_ok=True)
+                logger.debug(f"🗑️  Cleaned up: {file_path}")
             except Exception as e:
                 logger.warning(f"Failed to cleanup {file_path}: {e}")
     
-    def schedule_daily_ingestion(self):
-        """Schedule daily ingestion jobs"""
+    async def run_daily_ingestion(self):
+        """Run daily ingestion of yesterday's data at 02:00 UTC, sleeping in between"""
         
         # Define default products and regions for daily ingestion
         daily_jobs = [
@@ -200,30 +280,36 @@ class TerraIngestor:
             }
         ]
         
-        def run_daily_ingestion():
-            """Run daily ingestion for yesterday's data"""
-            yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        logger.info("📅 Scheduled daily ingestion at 02:00 UTC")
+        
+        while True:
+            # Sleep until the next 02:00 UTC
+            now = datetime.utcnow()
+            next_run = now.replace(hour=2, minute=0, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            await asyncio.sleep((next_run - now).total_seconds())
             
-            for job_config in daily_jobs:
-                job = IngestionJob(
+            yesterday = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%d')
+            jobs = [
+                IngestionJob(
                     product=job_config['product'],
                     date=yesterday,
                     bbox=job_config['bbox']
                 )
-                
-                # Run the job asynchronously
-                asyncio.create_task(self.process_job(job))
-        
-        # Schedule at 2 AM UTC daily
-        schedule.every().day.at("02:00").do(run_daily_ingestion)
-        logger.info("📅 Scheduled daily ingestion at 02:00 UTC")
+                for job_config in daily_jobs
+            ]
+            
+            results = await self.process_jobs(jobs)
+            succeeded = sum(1 for result in results if result['status'] == 'success')
+            logger.info(f"🏁 Daily ingestion for {yesterday}: {succeeded}/{len(jobs)} jobs succeeded")
 
 async def main():
     """Main entry point"""
     ingestor = TerraIngestor()
     
     # Setup scheduled jobs
-    ingestor.schedule_daily_ingestion()
+    daily_ingestion = asyncio.create_task(ingestor.run_daily_ingestion())
     
     # Example: Process recent MODIS data
     if os.getenv('RUN_EXAMPLE', 'false').lower() == 'true':
@@ -244,11 +330,9 @@ async def main():
         
         logger.info(f"🏁 Example completed: {len(results)} jobs processed")
     
-    # Keep the service running and check for scheduled jobs
-    logger.info("🔄 Starting scheduler loop...")
-    while True:
-        schedule.run_pending()
-        await asyncio.sleep(60)  # Check every minute
+    # Keep the service running until the daily ingestion loop stops
+    logger.info("🔄 Waiting for scheduled ingestion...")
+    await daily_ingestion
 
 if __name__ == "__main__":
     try:
@@ -9,18 +9,24 @@ import sys
 import time
 import logging
 import asyncio
+import hashlib
+import io
+import json
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
-import tempfile
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
 import numpy as np
 from PIL import Image
 import rasterio
 from rasterio.transform import from_bounds
 from rasterio.warp import calculate_default_transform, reproject, Resampling
+from rasterio.windows import Window, transform as window_transform
 import rioxarray as rxr
 import xarray as xr
 from minio import Minio
@@ -28,6 +34,12 @@ from minio.error import S3Error
 import redis
 from dotenv import load_dotenv
 
+# JIT compiler for the tile math (optional, plain NumPy otherwise)
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 # Load environment variables
 load_dotenv()
 
@@ -38,6 +50,56 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Concurrent WMTS tile downloads and attempts per tile (429/5xx are retried)
+TILE_CONCURRENCY = int(os.getenv('TILE_CONCURRENCY', '32'))
+MAX_RETRIES = 3
+
+# 'async' downloads tiles with aiohttp, 'threads' with a thread pool over the requests session
+TILE_FETCH_MODE = os.getenv('TILE_FETCH_MODE', 'async')
+TILE_THREADS = 16
+
+# Raw tile bytes cached in Redis for a week; large tiles are not cached to spare other keys
+TILE_CACHE_TTL = 7 * 86400
+TILE_CACHE_MAX_BYTES = 512 * 1024
+
+# GIBS resolution and image format of each layer (anything else is 250m JPEG)
+LAYER_META = {
+    'MODIS_Terra_CorrectedReflectance_TrueColor': ('250m', 'jpg'),
+    'MODIS_Terra_CorrectedReflectance_Bands721': ('500m', 'jpg'),
+    'MODIS_Terra_CorrectedReflectance_Bands367': ('500m', 'jpg'),
+    'MODIS_Terra_SurfaceReflectance_Bands121': ('500m', 'jpg'),
+    'MODIS_Terra_Aerosol': ('1km', 'png'),
+    'MODIS_Terra_Chlorophyll_A': ('4km', 'png'),
+}
+
+# Multipart uploads: frames above one part go up in 8 MiB parts, several parts at a time
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_PARALLEL_PARTS = 4
+UPLOAD_WORKERS = 8
+
+# Reprojection works through the output in square windows of this size (a multiple of the 256px blocks)
+REPROJECT_WINDOW = 2048
+
+# Most tiles a single frame may span; larger bboxes are rendered at a coarser zoom
+MAX_FRAME_TILES = 25
+
+# How long a confirmed frame object (and a published manifest) is remembered in Redis before S3 is asked again
+FRAME_EXISTS_TTL = 3600
+MANIFEST_CACHE_CONTROL = 'public, max-age=300'
+# Longest a manifest update may hold (or wait for) the per-manifest Redis lock, in seconds
+MANIFEST_LOCK_TIMEOUT = 30
+
+def _deg2num_arr(lats: np.ndarray, lons: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator tile x/y of each lat/lon pair (degrees) at a zoom level, clamped to the grid"""
+    n = 2.0 ** zoom
+    xs = np.floor((lons + 180.0) / 360.0 * n)
+    ys = np.floor((1.0 - np.arcsinh(np.tan(np.radians(lats))) / np.pi) / 2.0 * n)
+    return (np.minimum(np.maximum(xs, 0.0), n - 1).astype(np.int32),
+            np.minimum(np.maximum(ys, 0.0), n - 1).astype(np.int32))
+
+if njit is not None:
+    _deg2num_arr = njit(cache=True)(_deg2num_arr)
+
 class TerraIngestor:
     """Main class for Terra satellite data ingestion and processing"""
     
@@ -45,16 +107,37 @@ class TerraIngestor:
         self.setup_config()
         self.setup_storage()
         self.setup_cache()
+        self._tile_coords_cache = {}
+        # Tile decoders shared by every frame, rather than a new pool per frame
+        self._decode_pool = ThreadPoolExecutor(max_workers=8)
+        # Tile downloaders for the 'threads' fetch mode, one pool for every batch and date
+        self._fetch_pool = ThreadPoolExecutor(max_workers=TILE_THREADS)
         
     def setup_config(self):
         """Initialize configuration from environment variables"""
         self.earthdata_username = os.getenv('EARTHDATA_USERNAME')
         self.earthdata_password = os.getenv('EARTHDATA_PASSWORD')
-        self.nasa_gibs_url = os.getenv('NASA_GIBS_WMTS_URL', 'https://gibs.earthdata.nasa.gov/wmts/epsg4326/best')
+        self.nasa_gibs_url = os.getenv('NASA_GIBS_WMTS_URL', 'https://gibs.earthdata.nasa.gov/wmts/epsg4326/best').rstrip('/')
         self.laads_url = os.getenv('LAADS_DAAC_URL', 'https://ladsweb.modaps.eosdis.nasa.gov/api/v2')
         self.temp_dir = Path(os.getenv('TEMP_DIR', '/tmp/terra25'))
         self.temp_dir.mkdir(parents=True, exist_ok=True)
         
+        # Keep-alive session so tile requests reuse TCP/TLS connections
+        self.session = requests.Session()
+        retry = Retry(
+            total=5,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': 'Terra25-Ingestor/1.0',
+            'Accept-Encoding': 'gzip'
+        })
+        
     def setup_storage(self):
         """Initialize S3/MinIO storage connection"""
         try:
@@ -88,10 +171,61 @@ class TerraIngestor:
                 decode_responses=True
             )
             self.redis_client.ping()
+            
+            # Binary client for tile payloads (JPEG/PNG bytes must not be decoded)
+            self.tile_cache = redis.Redis(
+                connection_pool=redis.ConnectionPool(
+                    host=os.getenv('REDIS_HOST', 'localhost'),
+                    port=int(os.getenv('REDIS_PORT', '6379')),
+                    db=0
+                )
+            )
             logger.info("Cache connection established")
         except Exception as e:
             logger.warning(f"Cache not available: {e}")
             self.redis_client = None
+            self.tile_cache = None
+
+    def _get_cached_tiles(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Look up tile payloads in Redis in one round-trip (misses and errors are None)"""
+        if self.tile_cache is None or not keys:
+            return [None] * len(keys)
+        try:
+            return self.tile_cache.mget(keys)
+        except redis.RedisError as e:
+            logger.warning(f"Tile cache read failed: {e}")
+            return [None] * len(keys)
+
+    def _cache_tiles(self, tiles: Dict[str, bytes]):
+        """Store tile payloads in Redis with a TTL, skipping oversized tiles"""
+        if self.tile_cache is None:
+            return
+        try:
+            pipe = self.tile_cache.pipeline(transaction=False)
+            for key, content in tiles.items():
+                if len(content) <= TILE_CACHE_MAX_BYTES:
+                    pipe.setex(key, TILE_CACHE_TTL, content)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Tile cache write failed: {e}")
+
+    @staticmethod
+    def _tile_cache_key(layer: str, date: str, z: int, x: int, y: int) -> str:
+        """Redis key of a cached tile"""
+        return f"wmts:{layer}:{date}:{z}:{x}:{y}"
+
+    @staticmethod
+    def _bbox_key(bbox: Dict[str, float]) -> str:
+        """Stable short digest of a bbox, the same across processes and key orders"""
+        return hashlib.blake2b(json.dumps(bbox, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+    def _tile_url(self, layer: str, date: str, z: int, x: int, y: int) -> str:
+        """Build the GIBS WMTS URL of a tile"""
+        # Determine resolution and format based on layer
+        resolution, fmt = LAYER_META.get(layer, ('250m', 'jpg'))
+        
+        # Build WMTS URL
+        return f"{self.nasa_gibs_url}/{layer}/default/{date}/{resolution}/{z}/{y}/{x}.{fmt}"
 
     def fetch_wmts_tile(self, layer: str, date: str, z: int, x: int, y: int) -> Optional[bytes]:
         """
@@ -108,36 +242,43 @@ class TerraIngestor:
             Tile data as bytes or None if failed
         """
         try:
-            # Determine resolution and format based on layer
-            resolution_map = {
-                'MODIS_Terra_CorrectedReflectance_TrueColor': '250m',
-                'MODIS_Terra_CorrectedReflectance_Bands721': '500m',
-                'MODIS_Terra_CorrectedReflectance_Bands367': '500m',
-                'MODIS_Terra_SurfaceReflectance_Bands121': '500m',
-                'MODIS_Terra_Aerosol': '1km',
-                'MODIS_Terra_Chlorophyll_A': '4km',
-            }
+            key = self._tile_cache_key(layer, date, z, x, y)
+            cached = self._get_cached_tiles([key])[0]
+            if cached is not None:
+                return cached
             
-            format_map = {
-                'MODIS_Terra_CorrectedReflectance_TrueColor': 'jpg',
-                'MODIS_Terra_CorrectedReflectance_Bands721': 'jpg',
-                'MODIS_Terra_CorrectedReflectance_Bands367': 'jpg',
-                'MODIS_Terra_SurfaceReflectance_Bands121': 'jpg',
-                'MODIS_Terra_Aerosol': 'png',
-                'MODIS_Terra_Chlorophyll_A': 'png',
-            }
+            content = self._download_tile(layer, date, z, x, y)
+            if content:
+                self._cache_tiles({key: content})
+            return content
             
-            resolution = resolution_map.get(layer, '250m')
-            fmt = format_map.get(layer, 'jpg')
+        except Exception as e:
+            logger.error(f"Unexpected error fetching tile: {e}")
+            return None
+
+    def fetch_wmts_tiles(self, layer: str, z: int, tiles: List[Tuple[str, int, int]]) -> List[Optional[bytes]]:
+        """
+        Download many WMTS tiles at once on the shared fetch pool (threads share the keep-alive session)
+        
+        Args:
+            layer: Terra layer identifier
+            z: Zoom level
+            tiles: (date, x, y) of each tile
             
-            # Build WMTS URL
-            url = f"{self.nasa_gibs_url}/{layer}/default/{date}/{resolution}/{z}/{y}/{x}.{fmt}"
+        Returns:
+            Tile data in the order of tiles, None where a download failed
+        """
+        return list(self._fetch_pool.map(lambda tile: self._download_tile(layer, tile[0], z, tile[1], tile[2]), tiles))
+
+    def _download_tile(self, layer: str, date: str, z: int, x: int, y: int) -> Optional[bytes]:
+        """Download a single tile, bypassing the cache"""
+        try:
+            url = self._tile_url(layer, date, z, x, y)
             
             logger.info(f"Fetching tile: {url}")
             
-            response = requests.get(url, timeout=30)
+            response = self.session.get(url, timeout=(5, 30))
             response.raise_for_status()
-            
             return response.content
             
         except requests.RequestException as e:
@@ -147,6 +288,41 @@ class TerraIngestor:
             logger.error(f"Unexpected error fetching tile: {e}")
             return None
 
+    async def fetch_wmts_tile_async(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                                    layer: str, date: str, z: int, x: int, y: int) -> Optional[bytes]:
+        """
+        Download WMTS tile from NASA GIBS without blocking the event loop
+        Rate limiting (429) and server errors are retried, honoring Retry-After
+        
+        Returns:
+            Tile data as bytes or None if failed
+        """
+        url = self._tile_url(layer, date, z, x, y)
+        
+        async with semaphore:
+            for attempt in range(MAX_RETRIES):
+                try:
+                    logger.info(f"Fetching tile: {url}")
+                    
+                    async with session.get(url) as response:
+                        if (response.status == 429 or response.status >= 500) and attempt + 1 < MAX_RETRIES:
+                            retry_after = response.headers.get('Retry-After', '')
+                            delay = float(retry_after) if retry_after.isdigit() else 0.5 * 2 ** attempt
+                            await asyncio.sleep(delay)
+                            continue
+                        
+                        response.raise_for_status()
+                        return await response.read()
+                        
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.error(f"Failed to fetch WMTS tile: {e}")
+                    return None
+                except Exception as e:
+                    logger.error(f"Unexpected error fetching tile: {e}")
+                    return None
+        
+        return None
+
     def download_laads_product(self, product: str, date: str, bbox: Dict[str, float]) -> Optional[str]:
         """
         Download LAADS product (stub implementation)
@@ -200,36 +376,65 @@ class TerraIngestor:
             output_path = Path(output_dir)
             output_path.mkdir(parents=True, exist_ok=True)
             
-            # Read input raster
-            with rasterio.open(input_file) as src:
-                # Calculate transform to Web Mercator (EPSG:3857)
-                dst_crs = 'EPSG:3857'
-                transform, width, height = calculate_default_transform(
-                    src.crs, dst_crs, src.width, src.height, *src.bounds
-                )
-                
-                # Create output dataset
-                kwargs = src.meta.copy()
-                kwargs.update({
-                    'crs': dst_crs,
-                    'transform': transform,
-                    'width': width,
-                    'height': height
-                })
-                
-                output_file = output_path / f"reprojected_{Path(input_file).stem}.tif"
-                
-                with rasterio.open(output_file, 'w', **kwargs) as dst:
-                    for i in range(1, src.count + 1):
-                        reproject(
-                            source=rasterio.band(src, i),
-                            destination=rasterio.band(dst, i),
-                            src_transform=src.transform,
-                            src_crs=src.crs,
-                            dst_transform=transform,
-                            dst_crs=dst_crs,
-                            resampling=Resampling.nearest
-                        )
+            # Give GDAL's block cache and warper room to use every core
+            with rasterio.Env(GDAL_CACHEMAX=512, GDAL_NUM_THREADS='ALL_CPUS'):
+                # Read input raster
+                with rasterio.open(input_file) as src:
+                    # Calculate transform to Web Mercator (EPSG:3857)
+                    dst_crs = 'EPSG:3857'
+                    transform, width, height = calculate_default_transform(
+                        src.crs, dst_crs, src.width, src.height, *src.bounds
+                    )
+                    
+                    # Create output dataset as a cloud-optimized layout: 256x256 internal tiles,
+                    # DEFLATE with a predictor suited to the data type, overviews added below
+                    kwargs = src.meta.copy()
+                    kwargs.update({
+                        'driver': 'GTiff',
+                        'crs': dst_crs,
+                        'transform': transform,
+                        'width': width,
+                        'height': height,
+                        'tiled': True,
+                        'blockxsize': 256,
+                        'blockysize': 256,
+                        'compress': 'DEFLATE',
+                        'predictor': 3 if np.issubdtype(np.dtype(src.dtypes[0]), np.floating) else 2,
+                        'BIGTIFF': 'IF_SAFER'
+                    })
+                    
+                    output_file = output_path / f"reprojected_{Path(input_file).stem}.tif"
+                    
+                    with rasterio.open(output_file, 'w', **kwargs) as dst:
+                        # Warp the output window by window so memory stays bounded for any raster size;
+                        # all bands share the transforms, so each window is a single multithreaded pass
+                        bands = list(range(1, src.count + 1))
+                        fill = src.nodata if src.nodata is not None else 0
+                        
+                        for row in range(0, height, REPROJECT_WINDOW):
+                            for col in range(0, width, REPROJECT_WINDOW):
+                                window = Window(col, row, min(REPROJECT_WINDOW, width - col), min(REPROJECT_WINDOW, height - row))
+                                data = np.full((src.count, window.height, window.width), fill, dtype=src.dtypes[0])
+                                reproject(
+                                    source=rasterio.band(src, bands),
+                                    destination=data,
+                                    src_transform=src.transform,
+                                    src_crs=src.crs,
+                                    src_nodata=src.nodata,
+                                    dst_transform=window_transform(window, transform),
+                                    dst_crs=dst_crs,
+                                    dst_nodata=src.nodata,
+                                    resampling=Resampling.nearest,
+                                    num_threads=max(1, (os.cpu_count() or 1) - 1),
+                                    warp_mem_limit=512
+                                )
+                                dst.write(data, window=window)
+                        
+                        # Overview pyramid down to about one 256px tile, so zoomed-out reads stay small
+                        factors = [f for f in (2, 4, 8, 16, 32) if max(width, height) // f >= 256]
+                        if factors:
+                            dst.build_overviews(factors, Resampling.average)
+                            dst.update_tags(ns='rio_overview', resampling='average')
             
             # Generate tiles (simplified - would use proper tiling algorithm)
             tiles = [str(output_file)]
@@ -249,72 +454,144 @@ class TerraIngestor:
             bbox: Bounding box with north, south, east, west keys
             layer: Terra layer to use
             
+        Returns:
+            List of URLs to generated frames
+        """
+        return asyncio.run(self.generate_frames_async(dates, bbox, layer))
+
+    async def generate_frames_async(self, dates: List[str], bbox: Dict[str, float], layer: str = 'MODIS_Terra_CorrectedReflectance_TrueColor') -> List[str]:
+        """
+        Generate animation frames, fetching, composing and uploading the dates concurrently
+        
         Returns:
             List of URLs to generated frames
         """
         try:
-            frame_urls = []
-            
-            # Calculate tile coordinates for bounding box at zoom level 5
-            zoom = 5
-            tile_coords = self._get_tile_coordinates(bbox, zoom)
-            
-            for date in dates:
-                frame_tiles = []
-                
-                # Download tiles for this date
-                for x, y in tile_coords:
-                    tile_data = self.fetch_wmts_tile(layer, date, zoom, x, y)
-                    if tile_data:
-                        frame_tiles.append((x, y, tile_data))
-                
-                if frame_tiles:
-                    # Compose tiles into single frame
-                    frame_path = self._compose_frame(frame_tiles, date, bbox, zoom)
-                    if frame_path:
-                        # Upload to storage
-                        object_name = f"frames/{layer}/{date}_{zoom}_{hash(str(bbox))}.png"
-                        frame_url = self._upload_to_storage(frame_path, object_name)
-                        if frame_url:
-                            frame_urls.append(frame_url)
+            loop = asyncio.get_running_loop()
+            
+            # Calculate tile coordinates for bounding box at zoom level 5 (or coarser for large bboxes)
+            zoom, tile_coords = self._get_tile_coordinates(bbox, 5)
+            bbox_key = self._bbox_key(bbox)
+            object_names = {date: f"frames/{layer}/{date}_{zoom}_{bbox_key}.png" for date in dates}
+            manifest_name = f"frames/{layer}/{bbox_key}/{zoom}/manifest.json"
+            
+            # A recent manifest covering every requested date answers without touching S3
+            manifest = await loop.run_in_executor(None, self._get_cached_manifest, manifest_name)
+            if all(date in manifest for date in dates):
+                return [manifest[date]['url'] for date in dates]
+            
+            # Frames rendered by an earlier run are reused as-is
+            etags = await asyncio.gather(*[
+                loop.run_in_executor(None, self._frame_etag, object_names[date]) for date in dates
+            ])
+            frame_etags = {date: etag for date, etag in zip(dates, etags) if etag}
+            dates = [date for date in dates if date not in frame_etags]
+            
+            # Every date flows through fetch -> compose -> upload on its own, so frames still downloading
+            # overlap with others being composed and uploaded; PIL and MinIO calls run on their own pools
+            semaphore = asyncio.Semaphore(TILE_CONCURRENCY)
+            connector = aiohttp.TCPConnector(limit=32, limit_per_host=8)
+            timeout = aiohttp.ClientTimeout(total=30)
+            
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                with ThreadPoolExecutor(max_workers=os.cpu_count()) as compose_pool, \
+                        ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as upload_pool:
+                    
+                    async def render(date: str) -> Optional[str]:
+                        tiles = [(date, x, y) for x, y in tile_coords]
+                        tile_data = await self._fetch_tiles(session, semaphore, layer, zoom, tiles)
+                        frame_tiles = [(x, y, data) for (_, x, y), data in zip(tiles, tile_data) if data]
+                        if not frame_tiles:
+                            return None
                         
-                        # Clean up local file
-                        os.unlink(frame_path)
-                
-                logger.info(f"Generated frame for {date}")
-            
-            logger.info(f"Generated {len(frame_urls)} total frames")
-            return frame_urls
+                        # Compose tiles into single frame, then upload it straight from memory
+                        frame_png = await loop.run_in_executor(compose_pool, self._compose_frame, frame_tiles)
+                        if not frame_png:
+                            return None
+                        etag = await loop.run_in_executor(upload_pool, self._upload_frame, frame_png, object_names[date])
+                        
+                        logger.info(f"Generated frame for {date}")
+                        return etag
+                    
+                    frame_etags.update(zip(dates, await asyncio.gather(*[render(date) for date in dates])))
+            
+            # Frames keep the order of the dates; one manifest lists them all for clients
+            frames = [
+                {'date': date, 'url': self._object_url(object_names[date]), 'etag': frame_etags[date]}
+                for date in object_names if frame_etags.get(date)
+            ]
+            if frames:
+                await loop.run_in_executor(None, self._publish_manifest, manifest_name, frames)
+            
+            logger.info(f"Generated {len(frames)} total frames")
+            return [frame['url'] for frame in frames]
             
         except Exception as e:
             logger.error(f"Frame generation failed: {e}")
             return []
 
-    def _get_tile_coordinates(self, bbox: Dict[str, float], zoom: int) -> List[Tuple[int, int]]:
-        """Calculate tile coordinates for bounding box at given zoom level"""
-        import math
+    async def _fetch_tiles(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                           layer: str, zoom: int, tiles: List[Tuple[str, int, int]]) -> List[Optional[bytes]]:
+        """Data of (date, x, y) tiles, served from the tile cache in one round-trip and downloaded otherwise"""
+        # Redis calls block, so they run off the event loop like the MinIO ones
+        loop = asyncio.get_running_loop()
+        keys = [self._tile_cache_key(layer, date, zoom, x, y) for date, x, y in tiles]
+        tile_data = await loop.run_in_executor(None, self._get_cached_tiles, keys)
+        missing = [i for i, data in enumerate(tile_data) if data is None]
+        if not missing:
+            return tile_data
         
-        def deg2num(lat_deg: float, lon_deg: float, zoom: int) -> Tuple[int, int]:
-            lat_rad = math.radians(lat_deg)
-            n = 2.0 ** zoom
-            x = int((lon_deg + 180.0) / 360.0 * n)
-            y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-            return (x, y)
+        if TILE_FETCH_MODE == 'threads':
+            # Every date's downloads share the ingestor's fetch pool
+            fetched = await asyncio.gather(*[
+                loop.run_in_executor(self._fetch_pool, self._download_tile, layer, date, zoom, x, y)
+                for date, x, y in (tiles[i] for i in missing)
+            ])
+        else:
+            fetched = await asyncio.gather(*[
+                self.fetch_wmts_tile_async(session, semaphore, layer, date, zoom, x, y)
+                for date, x, y in (tiles[i] for i in missing)
+            ])
+        
+        for i, data in zip(missing, fetched):
+            tile_data[i] = data
+        await loop.run_in_executor(None, self._cache_tiles, {keys[i]: data for i, data in zip(missing, fetched) if data})
+        return tile_data
+
+    def _get_tile_coordinates(self, bbox: Dict[str, float], zoom: int) -> Tuple[int, List[Tuple[int, int]]]:
+        """
+        Calculate tile coordinates for bounding box, starting at the given zoom level
         
-        # Get tile boundaries
-        min_x, max_y = deg2num(bbox['north'], bbox['west'], zoom)
-        max_x, min_y = deg2num(bbox['south'], bbox['east'], zoom)
+        The zoom is lowered until the bbox fits in MAX_FRAME_TILES tiles, so the whole
+        area is always covered.
+        
+        Returns:
+            Tuple of (zoom level used, list of (x, y) tile coordinates)
+        """
+        key = (tuple(round(bbox[side], 6) for side in ('west', 'south', 'east', 'north')), zoom)
+        if key in self._tile_coords_cache:
+            return self._tile_coords_cache[key]
+        
+        lats = np.array([bbox['north'], bbox['south']], dtype=np.float64)
+        lons = np.array([bbox['west'], bbox['east']], dtype=np.float64)
+        
+        while True:
+            # Tile boundaries: north-west corner gives the minimum x/y, south-east the maximum
+            (min_x, max_x), (min_y, max_y) = _deg2num_arr(lats, lons, zoom)
+            
+            if (max_x - min_x + 1) * (max_y - min_y + 1) <= MAX_FRAME_TILES or zoom == 0:
+                break
+            zoom -= 1
         
-        # Generate all tile coordinates in bounding box
-        coordinates = []
-        for x in range(min_x, max_x + 1):
-            for y in range(min_y, max_y + 1):
-                coordinates.append((x, y))
+        # All tile coordinates in bounding box, column by column
+        xx, yy = np.meshgrid(np.arange(min_x, max_x + 1), np.arange(min_y, max_y + 1), indexing='ij')
+        coordinates = [(int(x), int(y)) for x, y in zip(xx.ravel(), yy.ravel())]
         
-        return coordinates[:25]  # Limit to prevent excessive tile downloads
+        self._tile_coords_cache[key] = (zoom, coordinates)
+        return zoom, coordinates
 
-    def _compose_frame(self, tiles: List[Tuple[int, int, bytes]], date: str, bbox: Dict[str, float], zoom: int) -> Optional[str]:
-        """Compose individual tiles into a single frame image"""
+    def _compose_frame(self, tiles: List[Tuple[int, int, bytes]]) -> Optional[bytes]:
+        """Compose individual tiles into a single frame image, returned as PNG bytes"""
         try:
             if not tiles:
                 return None
@@ -329,47 +606,167 @@ class TerraIngestor:
             width = (max_x - min_x + 1) * tile_size
             height = (max_y - min_y + 1) * tile_size
             
-            # Create composite image
-            frame = Image.new('RGB', (width, height), (0, 0, 0))
-            
-            for x, y, tile_data in tiles:
+            # Create composite image (missing tiles stay black)
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            
+            # Decode tiles in parallel straight into their cell of the grid (cells never overlap),
+            # Pillow releases the GIL while decoding
+            decoded = [
+                (x, y, self._decode_pool.submit(
+                    self._decode_tile_into, tile_data,
+                    frame[(y - min_y) * tile_size:(y - min_y + 1) * tile_size,
+                          (x - min_x) * tile_size:(x - min_x + 1) * tile_size]
+                ))
+                for x, y, tile_data in tiles
+            ]
+            
+            for x, y, future in decoded:
                 try:
-                    tile_img = Image.open(io.BytesIO(tile_data))
-                    paste_x = (x - min_x) * tile_size
-                    paste_y = (y - min_y) * tile_size
-                    frame.paste(tile_img, (paste_x, paste_y))
+                    future.result()
                 except Exception as e:
                     logger.warning(f"Failed to paste tile {x},{y}: {e}")
                     continue
             
-            # Save frame
-            frame_path = self.temp_dir / f"frame_{date}_{zoom}_{hash(str(bbox))}.png"
-            frame.save(frame_path, 'PNG', optimize=True)
+            # Encode frame in memory (a transient intermediate, so favour encode speed over size)
+            buffer = io.BytesIO()
+            Image.fromarray(frame, 'RGB').save(buffer, 'PNG', compress_level=1)
             
-            return str(frame_path)
+            return buffer.getvalue()
             
         except Exception as e:
             logger.error(f"Frame composition failed: {e}")
             return None
 
-    def _upload_to_storage(self, file_path: str, object_name: str) -> Optional[str]:
-        """Upload file to S3/MinIO storage"""
+    @staticmethod
+    def _decode_tile_into(tile_data: bytes, out: np.ndarray):
+        """Decode tile bytes into a (H, W, 3) uint8 RGB slice, cropping tiles larger than it"""
+        # BytesIO over immutable bytes shares their buffer, so wrapping each tile costs no copy
+        with Image.open(io.BytesIO(tile_data)) as tile_img:
+            if tile_img.size[0] > out.shape[1] or tile_img.size[1] > out.shape[0]:
+                tile_img = tile_img.crop((0, 0, out.shape[1], out.shape[0]))
+            if tile_img.mode != 'RGB':
+                tile_img = tile_img.convert('RGB')
+            out[:tile_img.size[1], :tile_img.size[0]] = tile_img
+
+    def _upload_frame(self, frame_png: bytes, object_name: str) -> Optional[str]:
+        """Upload a composed frame from memory to S3/MinIO storage, returns its ETag"""
         try:
-            self.minio_client.fput_object(
+            result = self.minio_client.put_object(
                 bucket_name=self.bucket_name,
                 object_name=object_name,
-                file_path=file_path,
-                content_type='image/png'
+                data=io.BytesIO(frame_png),
+                length=len(frame_png),
+                content_type='image/png',
+                part_size=UPLOAD_PART_SIZE,
+                num_parallel_uploads=UPLOAD_PARALLEL_PARTS
             )
-            
-            # Return public URL
-            endpoint = os.getenv('MINIO_ENDPOINT', 'http://localhost:9000')
-            return f"{endpoint}/{self.bucket_name}/{object_name}"
+            return result.etag
             
         except S3Error as e:
             logger.error(f"Storage upload failed: {e}")
             return None
 
+    def _frame_etag(self, object_name: str) -> Optional[str]:
+        """ETag of a frame object already in storage (None if missing), remembering hits in Redis"""
+        cache_key = f"frame-etag:{object_name}"
+        if self.redis_client is not None:
+            try:
+                etag = self.redis_client.get(cache_key)
+                if etag:
+                    return etag
+            except redis.RedisError as e:
+                logger.warning(f"Frame cache read failed: {e}")
+        
+        try:
+            etag = self.minio_client.stat_object(self.bucket_name, object_name).etag
+        except S3Error:
+            return None
+        
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(cache_key, etag, ex=FRAME_EXISTS_TTL)
+            except redis.RedisError as e:
+                logger.warning(f"Frame cache write failed: {e}")
+        return etag
+
+    def _get_cached_manifest(self, manifest_name: str) -> Dict[str, Dict[str, str]]:
+        """Frames of a recently published manifest by date (empty if not cached)"""
+        if self.redis_client is None:
+            return {}
+        try:
+            cached = self.redis_client.get(f"manifest:{manifest_name}")
+        except redis.RedisError as e:
+            logger.warning(f"Manifest cache read failed: {e}")
+            return {}
+        if not cached:
+            return {}
+        try:
+            return {frame['date']: frame for frame in json.loads(cached)['frames']}
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed cached manifest {manifest_name}: {e}")
+            return {}
+
+    def _get_stored_manifest(self, manifest_name: str) -> Dict[str, Dict[str, str]]:
+        """Frames of the manifest in storage by date (empty if there is none)"""
+        try:
+            response = self.minio_client.get_object(self.bucket_name, manifest_name)
+        except S3Error:
+            return {}
+        try:
+            return {frame['date']: frame for frame in json.loads(response.read())['frames']}
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed manifest {manifest_name}: {e}")
+            return {}
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _publish_manifest(self, manifest_name: str, frames: List[Dict[str, str]]):
+        """
+        Merge frames into the frame index (URLs and ETags) of their bbox and zoom and remember
+        it in Redis; dates listed by earlier requests are kept. The read-merge-write holds a
+        per-manifest Redis lock, so concurrent workers never drop each other's dates
+        """
+        if self.redis_client is None:
+            # Nothing to lock with, only safe for a single worker
+            self._merge_manifest(manifest_name, frames)
+            return
+        
+        try:
+            with self.redis_client.lock(f"manifest-lock:{manifest_name}", timeout=MANIFEST_LOCK_TIMEOUT,
+                                        blocking_timeout=MANIFEST_LOCK_TIMEOUT):
+                manifest = self._merge_manifest(manifest_name, frames)
+                if manifest is not None:
+                    # Refresh the cached copy from exactly what was written
+                    self.redis_client.set(f"manifest:{manifest_name}", manifest, ex=FRAME_EXISTS_TTL)
+        except redis.RedisError as e:
+            logger.error(f"Manifest update failed for {manifest_name}: {e}")
+
+    def _merge_manifest(self, manifest_name: str, frames: List[Dict[str, str]]) -> Optional[bytes]:
+        """Merge frames into the stored manifest and upload it in one PUT, returns the bytes written"""
+        by_date = self._get_stored_manifest(manifest_name)
+        by_date.update((frame['date'], frame) for frame in frames)
+        manifest = json.dumps({'frames': [by_date[date] for date in sorted(by_date)]}).encode()
+        try:
+            self.minio_client.put_object(
+                bucket_name=self.bucket_name,
+                object_name=manifest_name,
+                data=io.BytesIO(manifest),
+                length=len(manifest),
+                content_type='application/json',
+                metadata={'Cache-Control': MANIFEST_CACHE_CONTROL}
+            )
+            logger.info(f"Published frame manifest: {self._object_url(manifest_name)}")
+        except S3Error as e:
+            logger.error(f"Manifest upload failed: {e}")
+            return None
+        return manifest
+
+    def _object_url(self, object_name: str) -> str:
+        """Public URL of a stored object"""
+        endpoint = os.getenv('MINIO_ENDPOINT', 'http://localhost:9000')
+        return f"{endpoint}/{self.bucket_name}/{object_name}"
+
 def main():
     """Main worker loop"""
     logger.info("Starting Terra25 Ingestor Worker")
@@ -406,6 +803,4 @@ def main():
             time.sleep(10)
 
 if __name__ == '__main__':
-    # Add missing import
-    import io
     main()
\ No newline at end of file